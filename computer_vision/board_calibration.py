@@ -0,0 +1,115 @@
+import json
+import os
+import time
+import cv2
+import numpy as np
+from computer_vision.frame_context import FrameContext
+
+# One file per camera serial and resolution, written by Chess_Core after a successful calibration
+CALIBRATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibrations")
+
+# Bump when the file layout changes, older files are then ignored and recalibrated
+CALIBRATION_VERSION = 1
+
+
+def calibration_path(serial, size):
+    """Path of the calibration file for a camera serial and (width, height) resolution"""
+    width, height = size
+    return os.path.join(CALIBRATION_DIR, f"{serial}_{width}x{height}.json")
+
+
+def save_calibration(path, serial, size, corners, matrix, warp_size, ranges=None):
+    """
+    Write a board calibration as JSON
+
+    Args:
+        path (str): Output file
+        serial (str): Camera serial number
+        size (tuple): (width, height) of the camera frames
+        corners (list): Board corners as found by detect_blue_corners (TL, TR, BL, BR)
+        matrix (np.ndarray): 3x3 camera -> board homography
+        warp_size (tuple): (width, height) of the warped board image
+        ranges (dict): Optional {name: (lower, upper)} HSV thresholds in use
+    """
+    data = {
+        "version": CALIBRATION_VERSION,
+        "serial": str(serial),
+        "size": [int(v) for v in size],
+        "saved": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "corners": [[float(x), float(y)] for x, y in corners],
+        "homography": np.asarray(matrix, dtype=np.float64).tolist(),
+        "warp_size": [int(v) for v in warp_size],
+        "ranges": {
+            colour: {"lower": [int(v) for v in lower], "upper": [int(v) for v in upper]}
+            for colour, (lower, upper) in (ranges or {}).items()
+        },
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Write then rename so a crash never leaves a half written calibration
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_calibration(path, serial, size):
+    """
+    Read a board calibration saved for this camera and resolution
+
+    Returns:
+        dict: "corners" list of (x, y), "homography" 3x3 array, "warp_size" tuple and
+              "ranges" {name: (lower, upper)}, or None if no calibration was saved
+
+    Raises:
+        ValueError: If the file is from another version, camera or resolution, or is malformed
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    if data.get("version") != CALIBRATION_VERSION:
+        raise ValueError(f"Calibration {path} has version {data.get('version')}, expected {CALIBRATION_VERSION}")
+    if data.get("serial") != str(serial) or tuple(data.get("size", ())) != tuple(size):
+        raise ValueError(f"Calibration {path} was saved for camera {data.get('serial')} at {data.get('size')}")
+
+    corners = [tuple(point) for point in data["corners"]]
+    matrix = np.array(data["homography"], dtype=np.float64)
+    if len(corners) != 4 or matrix.shape != (3, 3):
+        raise ValueError(f"Calibration {path} needs 4 corners and a 3x3 homography")
+
+    ranges = {
+        colour: (np.array(bounds["lower"], dtype=np.uint8), np.array(bounds["upper"], dtype=np.uint8))
+        for colour, bounds in data.get("ranges", {}).items()
+    }
+    return {"corners": corners, "homography": matrix, "warp_size": tuple(data["warp_size"]), "ranges": ranges}
+
+
+def markers_present(img, corners, radius=10, min_fraction=0.15):
+    """
+    Check that the blue markers are still where a saved calibration put them
+
+    Only a small window around each corner is converted and thresholded, so this is
+    far cheaper than a full detection.
+
+    Args:
+        img (np.ndarray): BGR camera frame
+        corners (list): Saved (x, y) marker positions
+        radius (int): Half size of the window checked around each corner
+        min_fraction (float): Fraction of blue pixels a window needs
+
+    Returns:
+        bool: True if every window contains enough marker colour
+    """
+    lower, upper = FrameContext.COLOUR_RANGES["blue"]
+    h, w = img.shape[:2]
+    for x, y in corners:
+        x, y = int(round(x)), int(round(y))
+        x1, y1, x2, y2 = x - radius, y - radius, x + radius + 1, y + radius + 1
+        if x1 < 0 or y1 < 0 or x2 > w or y2 > h:
+            return False
+        hsv = cv2.cvtColor(img[y1:y2, x1:x2], cv2.COLOR_BGR2HSV)
+        if cv2.countNonZero(cv2.inRange(hsv, lower, upper)) < min_fraction * hsv.shape[0] * hsv.shape[1]:
+            return False
+    return True
@@ -1,7 +1,14 @@
 #!/usr/bin/env python3
 import numpy as np
-import matplotlib.pyplot as plt
 from computer_vision import python_chess3 as chs
+from computer_vision import hsv_profile
+from computer_vision.illumination import IlluminationNormaliser
+from computer_vision.piece_classifier import DEFAULT_MODEL, PieceClassifier
+from computer_vision.session_replay import SessionRecorder, analyzer_settings
+from computer_vision import timing
+from computer_vision import log_utils
+from computer_vision.log_utils import lazy
+from computer_vision import board_calibration
 import rclpy
 from rclpy.node import Node
 from std_msgs.msg import String
@@ -11,11 +18,24 @@ import cv2
 from stockfish import Stockfish
 from std_msgs.msg import String, Bool
 import time
-import tkinter as tk
+import logging
+from collections import deque
+import json
 import shutil
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from std_srvs.srv import Trigger
 
 
+log = logging.getLogger(__name__)
+
+
+def stamp_ns(msg):
+    """Header stamp of a ROS message in nanoseconds"""
+    return msg.header.stamp.sec * 1_000_000_000 + msg.header.stamp.nanosec
+
+
 class Chess_Core(Node):
     def __init__(self):
         super().__init__('Chess_Core')
@@ -24,6 +44,10 @@ class Chess_Core(Node):
         self.create_subscription(Bool, '/move_complete', self.move_done_callback, 10)
         self.subscription = self.create_subscription(Image, 'ur3/diff', self.diff_callback, 10)
         self.publisher = self.create_publisher(String, '/send_move', 10)
+        self.diagnostics_publisher = self.create_publisher(String, '/chess_core/diagnostics', 10)
+        # Last resort when no corners can be found: ask an operator without blocking the game loop
+        self.operator_request_publisher = self.create_publisher(String, '/chess_core/operator_request', 10)
+        self.create_subscription(String, '/chess_core/operator_corners', self.operator_corners_callback, 10)
 
         #start game service
         self.run_game_flag = False
@@ -37,8 +61,69 @@ class Chess_Core(Node):
         self.msg_tog = 1
 
         self.game = chs.game() #the actual chess game
+        self.game.illumination = IlluminationNormaliser()
+        self.game.operator_request = self.request_operator_corners
         self.board = chs.chess.Board() #temporary board for checking stuff
 
+        # HSV threshold profile written by hsv_calibrator, reloaded whenever the file changes
+        profile = self.declare_parameter('hsv_profile', 'default').value
+        self.profile_watcher = hsv_profile.ProfileWatcher(hsv_profile.profile_path(profile),
+                                                          on_reload=self.profile_reloaded)
+        # calibrate changes self.game from a startup thread, profile reloads from the executor
+        self.game_lock = threading.Lock()
+        self.poll_profile()
+        self.create_timer(1.0, self.poll_profile)
+
+        # Vision log levels, e.g. "INFO,computer_vision.python_chess3=DEBUG"; repeats are rate limited
+        level, levels = log_utils.parse_levels(self.declare_parameter('log_level', 'INFO').value)
+        log_utils.configure(level or 'INFO', levels)
+
+        # 'camera' classifies squares from camera-space regions built once per calibration
+        # instead of warping every frame (see python_chess3.game.camera_sampler)
+        self.game.square_sampling = self.declare_parameter('square_sampling', 'warp').value
+        # Piece top height in squares for parallax-corrected camera sampling, and the camera
+        # focal length in pixels (0 = estimate it from the board warp)
+        self.game.piece_height = self.declare_parameter('piece_height', 0.0).value
+        self.game.camera_focal_length = self.declare_parameter('camera_focal_length', 0.0).value or None
+
+        # Local piece classifier trained by troubleshooting/train_piece_classifier.py, used
+        # instead of the colour thresholds when set ('default' = the model that script writes
+        # to computer_vision/models; no model is shipped, so train one first)
+        piece_model = self.declare_parameter('piece_model', '').value
+        self.piece_model_path = ''
+        if piece_model:
+            model_path = DEFAULT_MODEL if piece_model == 'default' else piece_model
+            try:
+                self.game.piece_classifier = PieceClassifier.load(model_path)
+                self.piece_model_path = model_path
+            except (OSError, ValueError, KeyError) as e:
+                self.get_logger().error(f'Could not load piece model {model_path}, using the colour '
+                                        f'thresholds instead: {e}')
+
+        # Aligned depth topic, e.g. /camera/camera/aligned_depth_to_color/image_raw; when set,
+        # depth is fused with colour for occupancy (see python_chess3.game.depth_heights).
+        # Recent depth frames are kept by header stamp and only one taken within
+        # depth_max_skew seconds of the colour frame is used with it
+        self.current_img_stamp = None
+        # Squares of an ambiguous reading waiting to be re-read from the next frame (see finish_reread)
+        self.pending_reread = None
+        self.depth_frames = deque(maxlen=10)  # (stamp_ns, depth in mm)
+        self.depth_max_skew = self.declare_parameter('depth_max_skew', 0.02).value
+        depth_topic = self.declare_parameter('depth_topic', '').value
+        if depth_topic:
+            self.create_subscription(Image, depth_topic, self.depth_callback, 10)
+
+        # Calibrations are saved per camera so warm restarts can skip corner detection
+        self.camera_serial = self.declare_parameter('camera_serial', 'default').value
+        if self.camera_serial == 'default':
+            self.get_logger().warning("camera_serial not set, the board calibration is shared by every camera "
+                                      "at this resolution; set it to the camera's serial number")
+
+        # Optional session recording for offline replay (see session_replay.py)
+        record_dir = self.declare_parameter('record_dir', '').value
+        self.recorder = SessionRecorder(record_dir) if record_dir else None
+        self.record_settings()
+
       
         self.current_board = [
             [-1, -1, -1, -1, -1, -1, -1, -1],
@@ -59,19 +144,143 @@ class Chess_Core(Node):
 
         self.diff = 20
 
-                # Set the correct Stockfish binary path here
+        # Startup runs concurrently: the engine spawns in the background while the node
+        # waits for the first camera frame, which is then calibrated in the background too.
+        # The node is ready (see check_ready) once all three are done.
+        self.ready = False
+        self.ready_publisher = self.create_publisher(Bool, '/chess_core/ready', 10)
+        self.startup_start = time.perf_counter()
+        self.startup_times = {}
+        self.startup_error = None
+        self.startup_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='chess_core_startup')
+        self.engine_future = self.startup_executor.submit(self.spawn_engine)
+        self.calibration_future = None
+        self.ready_timer = self.create_timer(0.05, self.check_ready)
+        self.get_logger().info('Chess_core has launched sucessfully')
+
+    @property
+    def stockfish(self):
+        """The engine, waiting for it to finish spawning if needed"""
+        return self.engine_future.result()
+
+    def spawn_engine(self):
+        # Set the correct Stockfish binary path here
         #STOCKFISH_PATH = "/usr/games/stockfish"  # Change this based on your OS
         STOCKFISH_PATH = shutil.which("stockfish")
 
-
-        self.stockfish = Stockfish(STOCKFISH_PATH)
-        self.stockfish.set_depth(18)  # Search depth (higher = stronger but slower)
-        self.stockfish.update_engine_parameters({
+        stockfish = Stockfish(STOCKFISH_PATH)
+        stockfish.set_depth(18)  # Search depth (higher = stronger but slower)
+        stockfish.update_engine_parameters({
             "Threads": 2, 
             "Hash": 512,
             "Skill Level": self.diff  # 0 (weakest) to 20 (strongest)
         })
-        self.get_logger().info('Chess_core has launched sucessfully')
+        self.startup_times['engine'] = time.perf_counter() - self.startup_start
+        return stockfish
+
+    def calibrate(self, img):
+        """
+        Calibrate the board from the first frame and build the colour lookup table
+
+        A calibration saved for this camera and resolution is reused if the blue markers
+        are still where it put them, otherwise the corners are detected and saved.
+        Runs on a startup thread, holding game_lock against profile reloads.
+        """
+        with self.game_lock:
+            size = (img.shape[1], img.shape[0])
+            path = board_calibration.calibration_path(self.camera_serial, size)
+            try:
+                saved = board_calibration.load_calibration(path, self.camera_serial, size)
+            except (ValueError, KeyError) as e:
+                self.get_logger().warning(f'Ignoring saved calibration: {e}')
+                saved = None
+
+            if saved is not None and board_calibration.markers_present(img, saved['corners']):
+                self.corners = saved['corners']
+                self.game.set_good_corners(self.corners)
+                self.game.warp_matrix, self.game.warp_size = saved['homography'], saved['warp_size']
+                # The profile file stays authoritative, the saved thresholds only stand in for a missing one
+                if saved['ranges'] and not os.path.exists(self.profile_watcher.path):
+                    hsv_profile.apply_ranges(saved['ranges'])
+                    self.record_settings()
+                self.get_logger().info(f'Reusing saved calibration {path}')
+                success = True
+            else:
+                corners, success = self.game.detect_blue_corners(img)
+                if success:
+                    self.save_corners(img, corners)
+
+            self.game.colour_lut()
+            if success and self.game.square_sampling == 'camera':
+                # Build the camera-space square regions now rather than on the first move
+                ordered, matrix, warp_size = self.game.board_warp(self.corners)
+                self.game.camera_sampler(ordered, matrix, warp_size, img.shape)
+            self.startup_times['calibration'] = time.perf_counter() - self.startup_start
+            return success
+
+    def save_corners(self, img, corners):
+        """Adopt newly detected board corners and save them as this camera's calibration"""
+        size = (img.shape[1], img.shape[0])
+        self.corners = corners
+        self.game.set_good_corners(corners)
+        # The camera or the board moved, so the depth of the board plane may have too
+        self.game.reset_depth_plane()
+        _, matrix, warp_size = self.game.board_warp(corners)
+        board_calibration.save_calibration(board_calibration.calibration_path(self.camera_serial, size),
+                                           self.camera_serial, size, corners, matrix, warp_size,
+                                           ranges=hsv_profile.current_ranges())
+
+    def analyze_frame(self, img, depth=None):
+        """
+        Read the board from a move frame with the calibrated corners (see
+        python_chess3.game.analyze_calibrated); fresh marker corners replace the saved calibration
+        """
+        board_array, corners, fresh = self.game.analyze_calibrated(img, self.corners, depth=depth)
+        if fresh:
+            self.save_corners(img, corners)
+        return board_array
+
+    def check_ready(self):
+        """Report readiness once the engine, first frame and calibration are all done"""
+        if self.ready or self.calibration_future is None:
+            return
+        if not (self.engine_future.done() and self.calibration_future.done()):
+            return
+
+        self.ready_timer.cancel()
+        self.startup_executor.shutdown(wait=False)
+        for name, future in (('engine', self.engine_future), ('calibration', self.calibration_future)):
+            if future.exception() is not None:
+                self.startup_error = f'{name} failed: {future.exception()!r}'
+                self.get_logger().error(f'Startup failed, shutting down: {self.startup_error}')
+                rclpy.shutdown()
+                return
+        calibrated = self.calibration_future.result()
+
+        self.ready = True
+        self.ready_publisher.publish(Bool(data=True))
+        times = ', '.join(f'{name} {seconds:.2f}s' for name, seconds in self.startup_times.items())
+        self.get_logger().info(f'Chess_Core ready after {time.perf_counter() - self.startup_start:.2f}s ({times})')
+        if not calibrated:
+            self.get_logger().warning('Board corners not found in the first frame, they will be detected per move')
+
+    def wait_until_ready(self, timeout=10.0):
+        """
+        Spin until startup has finished
+
+        Raises:
+            RuntimeError: If the engine, first frame or calibration is not done within the timeout,
+                or one of them failed.
+        """
+        deadline = time.perf_counter() + timeout
+        while rclpy.ok() and not self.ready:
+            rclpy.spin_once(self, timeout_sec=0.05)
+            if time.perf_counter() > deadline:
+                pending = [name for name in ('engine', 'first_frame', 'calibration')
+                           if name not in self.startup_times]
+                raise RuntimeError(f"Startup not complete after {timeout}s, waiting for {', '.join(pending)}")
+        if self.startup_error is not None:
+            raise RuntimeError(f"Startup failed: {self.startup_error}")
 
     def listener_callback(self, msg):
         try:
@@ -82,45 +291,80 @@ class Chess_Core(Node):
             #    self.prev_img = self.current_img
 
             self.current_img = img
+            self.current_img_stamp = stamp_ns(msg)
+            if self.calibration_future is None:
+                self.startup_times['first_frame'] = time.perf_counter() - self.startup_start
+                self.calibration_future = self.startup_executor.submit(self.calibrate, img.copy())
             #self.get_logger().info("Initial image captured and converted.")
 
         except CvBridgeError as e:
             self.get_logger().error(f'Failed to convert image: {e}')
 
-    def initialize_current_image(self, topic="/camera/camera/color/image_raw", timeout=5.0):
-        """
-        Blocks until the first image is received and initializes self.current_img.
+    def depth_callback(self, msg):
+        try:
+            depth = self.bridge.imgmsg_to_cv2(msg, desired_encoding='passthrough')
+        except CvBridgeError as e:
+            self.get_logger().error(f'Failed to convert depth image: {e}')
+            return
+        # RealSense publishes 16UC1 in mm, other drivers 32FC1 in metres
+        if depth.dtype != np.uint16:
+            depth = np.nan_to_num(depth * 1000.0).clip(0, 65535).astype(np.uint16)
+        self.depth_frames.append((stamp_ns(msg), depth))
 
-        Args:
-            topic (str): The ROS2 topic to listen for image messages.
-            timeout (float): Timeout in seconds to wait for the image.
+    def depth_for_current_frame(self):
+        """
+        The depth frame taken with current_img, or None
 
-        Raises:
-            RuntimeError: If no image is received within the timeout.
+        Depth from another moment (an arm still over the board, a piece not put down
+        yet) would contradict the colour frame, so a depth frame is only used when its
+        stamp is within depth_max_skew of the colour frame's.
         """
-        self.get_logger().info(f"Waiting for image on topic: {topic}")
+        if not self.depth_frames or self.current_img_stamp is None:
+            return None
+        stamp, depth = min(self.depth_frames, key=lambda frame: abs(frame[0] - self.current_img_stamp))
+        skew = abs(stamp - self.current_img_stamp) / 1e9
+        if skew > self.depth_max_skew:
+            self.get_logger().warning(f'No depth frame within {self.depth_max_skew}s of the colour frame '
+                                      f'(closest {skew:.3f}s), reading colour only')
+            return None
+        return depth
+
+    def poll_profile(self):
+        with self.game_lock:
+            self.profile_watcher.poll()
+
+    def profile_reloaded(self, ranges):
+        # Rebuild the colour LUT now rather than on the next turn's first frame
+        self.game.colour_lut()
+        # New thresholds were tuned under the current lighting, so it becomes the reference
+        self.game.illumination.reset()
+        self.get_logger().info(f"Loaded HSV profile {self.profile_watcher.path} ({', '.join(sorted(ranges))})")
+        self.record_settings()
+
+    def record_settings(self):
+        """Save the vision settings with the recorded session so replays use the same pipeline"""
+        # The first profile load happens in __init__, before the recorder exists
+        if getattr(self, 'recorder', None) is not None:
+            self.recorder.record_settings(analyzer_settings(self.game, self.piece_model_path))
+
+    def request_operator_corners(self):
+        self.get_logger().warning('Board corners lost, waiting for corners on /chess_core/operator_corners')
+        self.operator_request_publisher.publish(String(data=json.dumps({
+            'reason': 'corners_not_found',
+            'topic': '/chess_core/operator_corners',
+            'format': '[[x, y], ...] in TL, TR, BL, BR order',
+        })))
+
+    def operator_corners_callback(self, msg):
         try:
-            msg = self.create_subscription(
-                Image,
-                topic,
-                lambda m: setattr(self, "_initial_image_msg", m),
-                10
-            )
-
-            self._initial_image_msg = None
-            start = self.get_clock().now()
-
-            while rclpy.ok() and (self._initial_image_msg is None):
-                rclpy.spin_once(self, timeout_sec=0.1)
-                if (self.get_clock().now() - start).nanoseconds * 1e-9 > timeout:
-                    raise RuntimeError(f"Timeout: No image received on {topic}")
-
-            self.current_img = self.bridge.imgmsg_to_cv2(self._initial_image_msg, desired_encoding="bgr8")
-            self.get_logger().info("Initial image captured and converted.")
-
-        except Exception as e:
-            raise RuntimeError(f"Failed to initialize image: {e}")
-
+            corners = [tuple(float(v) for v in point) for point in json.loads(msg.data)]
+        except (ValueError, TypeError) as e:
+            self.get_logger().error(f'Invalid operator corners {msg.data!r}: {e}')
+            return
+        if len(corners) != 4 or any(len(point) != 2 for point in corners):
+            self.get_logger().error(f'Operator corners need 4 [x, y] points, got {msg.data!r}')
+            return
+        self.game.set_operator_corners(corners)
 
     def diff_callback(self, msg):
         self.diff = msg
@@ -137,6 +381,8 @@ class Chess_Core(Node):
 
     def move_done_callback(self,msg):
             self.move_flag = msg.data
+            if self.recorder is not None:
+                self.recorder.record_move_complete(msg.data)
             if msg.data:
                 self.get_logger().info("Human move confirmed complete.")
             else:
@@ -172,27 +418,97 @@ class Chess_Core(Node):
         # input("Press Enter to analyze move...")  # Wait for key press
 
 
+        depth = self.depth_for_current_frame()
+        if self.recorder is not None:
+            self.recorder.record_frame(self.current_img, depth=depth)
+
+        laps = timing.laps()
         # Analyze the new board state from current image
-        board_array, _ = self.game.analyze_chessboard(self.current_img, auto_calib=True, DEBUG=False)
+        board_array = self.analyze_frame(self.current_img, depth)
+        laps.mark("check_move.vision")
 
         # Compare boards to detect the move
         results = self.game.analyze_binary_board_state(board_array)
-        """
+        if results["detected_move"] is None:
+            results["detected_move"] = self.resolve_move_from_probabilities()
+        laps.mark("check_move.match")
+        laps.total("check_move")
+        self.publish_diagnostics()
+
         # Display the results
         if results["detected_move"]:
-            print(f"Move detected: {results['detected_move']}")
+            log.info("Move detected: %s", results["detected_move"])
         else:
-            print("No valid move detected")
-
-        print("PGN so far:", results["pgn"])
-        """
+            log.info("No valid move detected")
+        log.debug("PGN so far:\n%s", lazy(lambda: results["pgn"]))
 
         # Update previous image and board for next move detection
         self.prev_img = self.current_img.copy()
         self.current_board = board_array
 
         return results["detected_move"]
-    
+
+    def resolve_move_from_probabilities(self, k=3):
+        """
+        Fallback when the exact colour match fails: rank legal moves by likelihood.
+
+        If the reading is ambiguous, the disputed squares are re-read once from the next
+        camera frame by finish_reread, which the game loop calls on its following ticks,
+        so no callback has to spin the executor to wait for that frame.
+
+        Returns:
+            SAN of the resolved move, or None (also while a re-read is pending)
+        """
+        probs = self.game.square_probabilities
+        if probs is None:
+            return None
+
+        move, candidates, disputed = self.game.decode_move(probs, k=k)
+        if move is None and disputed:
+            self.get_logger().info(f"Ambiguous reading, re-reading squares {disputed} from the next frame")
+            self.pending_reread = {"probs": probs, "squares": disputed, "k": k, "stamp": self.current_img_stamp}
+            return None
+        return self.commit_decoded_move(move, candidates)
+
+    def finish_reread(self):
+        """
+        Complete a re-read requested by resolve_move_from_probabilities once a newer frame is in
+
+        Returns:
+            bool: True while still waiting for that frame
+        """
+        pending = self.pending_reread
+        if pending is None:
+            return False
+        if self.current_img_stamp == pending["stamp"]:
+            return True
+
+        self.pending_reread = None
+        probs = self.game.recapture_square_probabilities(self.current_img, pending["squares"], pending["probs"])
+        move, candidates, _ = self.game.decode_move(probs, k=pending["k"])
+        san = self.commit_decoded_move(move, candidates)
+        if san is not None:
+            log.info("Move detected after re-read: %s", san)
+        return False
+
+    def wait_for_reread(self):
+        """Blocking finish_reread for the synchronous run_game loop, never call it from a callback"""
+        while self.finish_reread():
+            rclpy.spin_once(self, timeout_sec=0.1)
+
+    def commit_decoded_move(self, move, candidates):
+        """Play a move decoded from probabilities, returns its SAN or None"""
+        if move is None:
+            self.get_logger().info(f"Could not resolve move, candidates: {candidates}")
+            return None
+
+        # Track the position the move should produce rather than the noisy reading
+        expected = self.game.board.copy()
+        expected.push(move)
+        san = self.game.board.san(move)
+        self.game.commit_move(move, self.game.board_to_color_array(expected))
+        return san
+
     def check_move_sim(self):
 
         """
@@ -211,12 +527,12 @@ class Chess_Core(Node):
 
         # Access the analysis results
         if results["detected_move"]:
-            print(f"Move detected: {results['detected_move']}")
+            log.info("Move detected: %s", results["detected_move"])
         else:
-            print("No valid move detected")
+            log.info("No valid move detected")
 
         # The PGN so far
-        print(results["pgn"])
+        log.info("PGN so far:\n%s", lazy(lambda: results["pgn"]))
                 
         #return results['detected_move']
 
@@ -239,7 +555,9 @@ class Chess_Core(Node):
         @return move that can be sent to the robot arm in the format <startcoord endcoord goal occupied> eg e2e40
         """
         fen = self.game.board.fen()  # use full FEN, not just board_fen
-        movecoord = self.get_best_move(fen)  # e.g., 'e2e4'
+        with timing.span("engine"):
+            movecoord = self.get_best_move(fen)  # e.g., 'e2e4'
+        self.publish_diagnostics()
 
         dest_square = movecoord[2:]  # 'e4'
         occupied = self.check_occupied_goal(dest_square)  # returns True or False
@@ -247,6 +565,18 @@ class Chess_Core(Node):
         move = movecoord + str(int(occupied))  # e.g., 'e2e41' or 'e2e40'
         return move
 
+    def publish_diagnostics(self):
+        """
+        @brief publishes the latest duration of every stage and the p50/p95/max summary
+        for the game so far as JSON on /chess_core/diagnostics
+        """
+        msg = String()
+        msg.data = json.dumps({
+            "last_ms": {stage: round(ns / 1e6, 3) for stage, ns in timing.stages.last.items()},
+            "summary": timing.stages.summary(),
+        })
+        self.diagnostics_publisher.publish(msg)
+
     def check_occupied_goal(self, goal):
         """
         @brief checks the current board state against a goal to determine if the target square is occupied or not
@@ -270,7 +600,9 @@ class Chess_Core(Node):
         return self.move_flag
 
     def manually_select_chess_pieces(self, initial_state=None):
-        
+        # Only the simulation UI needs tkinter, keep it out of node startup
+        import tkinter as tk
+
 
         board_size = 8
         cell_size = 60
@@ -324,7 +656,8 @@ class Chess_Core(Node):
         if self.current_board is None or len(self.current_board) == 0:
                 self.get_logger().info('Initialising Board')
                 self.check_move()
-                print(self.current_board)
+                self.wait_for_reread()
+                log.info("Initial board:\n%s", lazy(lambda: np.array(self.current_board)))
                 
         if self.turn == 0:  # player's turn
             self.get_logger().info('Players Turn')
@@ -336,6 +669,7 @@ class Chess_Core(Node):
                 rclpy.spin_once(self, timeout_sec=0.5)    # flag is set as 1 by GUI
             self.msg_tog = 1
             move = self.check_move()
+            self.wait_for_reread()
             self.get_logger().info('Updating Board')
             #gameover = self.update_board(move)
             self.turn = 1
@@ -357,6 +691,7 @@ class Chess_Core(Node):
             self.msg_tog = 1
             self.get_logger().info('robot move complete, checking board state')
             move = self.check_move()
+            self.wait_for_reread()
             self.get_logger().info('Updating Board')
             #gameover = self.update_board(move)
             self.turn = 0
@@ -364,7 +699,7 @@ class Chess_Core(Node):
 
     def start_game(self):
         #self.get_logger().info('initilising current img')
-        self.initialize_current_image()
+        self.wait_until_ready()
         self.get_logger().info('game started')
         run = True
         while run:
@@ -412,10 +747,12 @@ class Chess_Core(Node):
         while run:
             run = not self.run_game_simulated()
         self.get_logger().info('Game Complete')
+        self.get_logger().info("Stage latency this game:\n" + timing.stages.format_summary())
 
     def start_game_callback(self, request, response):
         if not self.run_game_flag:
             self.get_logger().info("Received request to start game.")
+            timing.stages.reset()  # latency summary is per game
             self.run_game_flag = True
             response.success = True
             response.message = "Game start flag set."
@@ -428,7 +765,13 @@ class Chess_Core(Node):
         if not self.run_game_flag:
             return
 
+        # An ambiguous reading waits for the next frame before the game moves on
+        if self.finish_reread():
+            return
+
         if self.game_phase == "INIT":
+            if not self.ready:
+                return
             self.get_logger().info("Initializing board...")
             if self.current_board and len(self.current_board) > 0:
                 self.game_phase = "PLAYER_WAIT"
@@ -469,10 +812,14 @@ class Chess_Core(Node):
 
         elif self.game_phase == "GAME_OVER":
             self.get_logger().info("Game complete.")
+            self.get_logger().info("Stage latency this game:\n" + timing.stages.format_summary())
             self.run_game_flag = False
             self.game_phase = "IDLE"
 
-
+    def destroy_node(self):
+        if self.recorder is not None:
+            self.recorder.close()
+        super().destroy_node()
 
 
 def main(args=None):
@@ -485,9 +832,13 @@ def main(args=None):
 def main2(args=None):
     rclpy.init(args=args)
     chess_node = Chess_Core()
-    rclpy.spin(chess_node)  # <--- this is required for services and timers to work
-    chess_node.destroy_node()
-    rclpy.shutdown()
+    try:
+        rclpy.spin(chess_node)  # <--- this is required for services and timers to work
+    finally:
+        # Also on Ctrl+C, so a session being recorded is closed properly
+        chess_node.destroy_node()
+        if rclpy.ok():
+            rclpy.shutdown()
 
 if __name__ == "__main__":
     main2()
\ No newline at end of file
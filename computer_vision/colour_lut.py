@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+
+# Label bits. The HSV ranges overlap (the blue marker range covers saturated
+# yellow, for example) so a pixel can belong to more than one class; label 0 is
+# "empty" and every other label is a combination of these bits.
+PINK = 1
+YELLOW = 2
+BLUE = 4
+
+CLASS_BITS = {"pink": PINK, "yellow": YELLOW, "blue": BLUE}
+
+
+class ColourLUT:
+    """
+    Quantised BGR -> colour class lookup table
+
+    Every BGR bin centre is converted to HSV once and tested against the class
+    ranges, so a frame can be segmented with one table lookup per pixel and no
+    per-frame HSV conversion or inRange calls.
+    """
+
+    def __init__(self, colour_ranges, bins=32):
+        """
+        Args:
+            colour_ranges (dict): Class name ("pink", "yellow", "blue") -> (lower, upper) HSV bounds
+            bins (int): Bins per BGR channel, a power of two up to 256 (32 or 64 is plenty)
+        """
+        if bins not in (2, 4, 8, 16, 32, 64, 128, 256):
+            raise ValueError(f"bins must be a power of two up to 256, got {bins}")
+
+        self.bins = bins
+        self.shift = 8 - int(np.log2(bins))
+        self.key = lut_key(colour_ranges, bins)
+
+        # HSV of every bin centre, laid out as a (bins^3, 1, 3) image for cvtColor
+        step = 256 // bins
+        centres = (np.arange(bins) * step + step // 2).clip(0, 255).astype(np.uint8)
+        b, g, r = np.meshgrid(centres, centres, centres, indexing="ij")
+        bgr = np.stack([b, g, r], axis=-1).reshape(-1, 1, 3)
+        hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+
+        table = np.zeros(bins ** 3, dtype=np.uint8)
+        for name, (lower, upper) in colour_ranges.items():
+            inside = cv2.inRange(hsv, np.asarray(lower), np.asarray(upper)).ravel() > 0
+            table[inside] |= CLASS_BITS[name]
+        self.table = table
+
+        # 15-bit indices fit in uint16 up to 32 bins, larger tables need uint32
+        self._index_dtype = np.uint16 if bins <= 32 else np.uint32
+
+    def label(self, bgr):
+        """
+        Label every pixel of a BGR image
+
+        Returns:
+            np.ndarray: uint8 image of class bits (0 = empty)
+        """
+        bits = 8 - self.shift
+        quantised = bgr >> self.shift
+        index = ((quantised[..., 0].astype(self._index_dtype) << (2 * bits))
+                 | (quantised[..., 1].astype(self._index_dtype) << bits)
+                 | quantised[..., 2])
+        return np.take(self.table, index)
+
+    @staticmethod
+    def mask(labels, name):
+        """Binary 0/255 mask of one class from a label image"""
+        return cv2.compare(labels & CLASS_BITS[name], 0, cv2.CMP_GT)
+
+
+def lut_key(colour_ranges, bins):
+    """Hashable key identifying a set of thresholds, used to know when to rebuild"""
+    return (bins,) + tuple(
+        (name, tuple(int(v) for v in lower), tuple(int(v) for v in upper))
+        for name, (lower, upper) in sorted(colour_ranges.items())
+    )
+
+
+_lut_cache = {}
+
+
+def get_colour_lut(colour_ranges, bins=32):
+    """
+    Return the LUT for a set of thresholds, building it only the first time they are seen
+
+    Changing any range changes the key, so the table is regenerated automatically.
+    """
+    key = lut_key(colour_ranges, bins)
+    lut = _lut_cache.get(key)
+    if lut is None:
+        _lut_cache.clear()  # only the current thresholds are worth keeping
+        lut = _lut_cache[key] = ColourLUT(colour_ranges, bins=bins)
+    return lut
@@ -0,0 +1,179 @@
+import cv2
+import numpy as np
+from computer_vision.square_sampling import lifted_warp
+
+
+class DepthOccupancy:
+    """
+    Height of whatever stands on each square, from the depth image aligned to the colour frame
+
+    Built once per board warp: the board window of the depth image is sampled every
+    `step` pixels and each sample is assigned to the square it falls in (the inner
+    part only, so pieces on neighbouring squares do not count). Like SquareSampler's
+    regions, the squares are laid out on the plane of the piece tops, so a tilted camera
+    measures each piece where it sees it rather than the square it leans into; the
+    board plane is fitted from the samples that land on empty squares of the board
+    itself. After the fit a frame costs one strided slice, one gather into a 64 x
+    samples table and one sort for the per-square percentile.
+    """
+
+    def __init__(self, corners, matrix, size, image_shape, step=4, inset=0.15, height=0.0, focal_length=None):
+        """
+        Args:
+            corners (np.ndarray): Ordered board corners the warp was built from
+            matrix (np.ndarray): 3x3 camera -> board image transform
+            size (tuple): (width, height) of the board image
+            image_shape (tuple): Shape of the (aligned) depth frames
+            step (int): Sample every step-th depth pixel in x and y
+            inset (float): Fraction of a square ignored along each edge
+            height (float): Height of the piece tops in board image pixels (see lifted_warp)
+            focal_length (float): Camera focal length in pixels, estimated if None
+        """
+        self.corners = np.array(corners, dtype=np.float32).reshape(4, 2)
+        self.size = tuple(size)
+        self.image_shape = tuple(image_shape[:2])
+        self.step = step
+        self.height = float(height)
+        self.focal_length = focal_length
+        self.plane_depth = None
+
+        matrix = np.asarray(matrix, dtype=np.float64)
+        lifted = lifted_warp(matrix, self.size, self.image_shape, self.height, focal_length)
+        width, height = self.size
+        image_height, image_width = self.image_shape
+        board_rect = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float64)
+        quad = np.concatenate([
+            cv2.perspectiveTransform(board_rect.reshape(-1, 1, 2), np.linalg.inv(warp)).reshape(-1, 2)
+            for warp in (matrix, lifted)])
+        wx1 = min(max(int(np.floor(quad[:, 0].min())), 0), image_width)
+        wy1 = min(max(int(np.floor(quad[:, 1].min())), 0), image_height)
+        wx2 = max(min(int(np.ceil(quad[:, 0].max())) + 1, image_width), wx1)
+        wy2 = max(min(int(np.ceil(quad[:, 1].max())) + 1, image_height), wy1)
+        self.window = (wx1, wy1, wx2, wy2)
+
+        grid_y, grid_x = np.mgrid[wy1:wy2:step, wx1:wx2:step]
+        self.points = np.stack([grid_x.ravel(), grid_y.ravel()], axis=1).astype(np.float64)
+        # Squares on the board itself fit the plane, squares on the piece-top plane are measured
+        self.plane_squares = self._assign(matrix, inset)
+        self.squares = self._assign(lifted, inset)
+
+        # 64 x samples table of ROI indices, padded with -1 (a NaN appended to every frame)
+        inside = self.squares >= 0
+        index = np.flatnonzero(inside)
+        square = self.squares[index]
+        order = np.argsort(square, kind="stable")
+        index, square = index[order], square[order]
+        counts = np.bincount(square, minlength=64)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        self.gather = np.full((64, max(int(counts.max(initial=0)), 1)), -1, dtype=np.int64)
+        self.gather[square, np.arange(len(index)) - starts[square]] = index
+
+    def _assign(self, matrix, inset):
+        """Square index (row * 8 + col) of every sample point through a warp, -1 off the squares' inner parts"""
+        width, height = self.size
+        mapped = cv2.perspectiveTransform(self.points.reshape(-1, 1, 2), matrix).reshape(-1, 2)
+        u = mapped[:, 0] / (width / 8)
+        v = mapped[:, 1] / (height / 8)
+        col, row = np.floor(u).astype(np.int64), np.floor(v).astype(np.int64)
+        fu, fv = u - col, v - row
+        inside = ((col >= 0) & (col < 8) & (row >= 0) & (row < 8)
+                  & (fu >= inset) & (fu < 1 - inset) & (fv >= inset) & (fv < 1 - inset))
+        return np.where(inside, row * 8 + col, -1)
+
+    def matches(self, corners, shape, tolerance=1.0, height=0.0, focal_length=None):
+        """True if these squares still fit a warp built from corners on frames of this shape"""
+        corners = np.asarray(corners, dtype=np.float32).reshape(4, 2)
+        return tuple(shape[:2]) == self.image_shape and self.height == float(height) and \
+            self.focal_length == focal_length and \
+            float(np.abs(corners - self.corners).max()) <= tolerance
+
+    def sample(self, depth):
+        """Strided board window of a depth frame as float mm, NaN where the camera had no reading"""
+        x1, y1, x2, y2 = self.window
+        roi = depth[y1:y2:self.step, x1:x2:self.step].astype(np.float32).ravel()
+        roi[roi <= 0] = np.nan
+        return roi
+
+    def fit_plane(self, depth, empty, min_samples=50):
+        """
+        Fit the board plane from the depth of squares known to be empty
+
+        For a plane seen through a pinhole camera 1/depth is linear in the pixel
+        coordinates, so this is a linear least squares fit, repeated once without
+        the samples far off the first fit (stray objects, depth noise at edges).
+
+        Args:
+            depth (np.ndarray): Aligned depth frame in mm
+            empty (np.ndarray): 8x8 bool, True for squares with nothing on them
+
+        Returns:
+            bool: True if enough empty squares had depth to fit the plane
+        """
+        roi = self.sample(depth)
+        empty_squares = np.flatnonzero(np.asarray(empty, dtype=bool).ravel())
+        use = np.isin(self.plane_squares, empty_squares) & np.isfinite(roi)
+        if use.sum() < min_samples:
+            return False
+
+        design = np.column_stack([self.points, np.ones(len(self.points))])
+        target = 1.0 / roi
+        for _ in range(2):
+            coef, *_ = np.linalg.lstsq(design[use], target[use], rcond=None)
+            residual = np.abs(design @ coef - target)
+            spread = np.median(residual[use]) * 1.4826 + 1e-12
+            use &= residual <= 3 * spread
+        self.plane_depth = (1.0 / (design @ coef)).astype(np.float32)
+        return True
+
+    def heights(self, depth, percentile=90):
+        """
+        Per-square height above the board plane in mm (along the camera's view)
+
+        Returns:
+            np.ndarray: 8x8 float, NaN for squares without depth readings
+        """
+        if self.plane_depth is None:
+            raise RuntimeError("Board plane not fitted yet, call fit_plane first")
+        height = np.append(self.plane_depth - self.sample(depth), np.float32(np.nan))
+        values = np.sort(height[self.gather], axis=1)  # NaNs sort last
+        valid = np.count_nonzero(np.isfinite(values), axis=1)
+        pick = np.floor(percentile / 100 * np.maximum(valid - 1, 0)).astype(np.int64)
+        result = values[np.arange(64), pick]
+        result[valid == 0] = np.nan
+        return result.reshape(8, 8)
+
+
+def fuse_depth(board, square_probs, heights, fallback, threshold=12.0, softness=2.0):
+    """
+    Combine colour classification with depth occupancy
+
+    Depth decides whether a square is occupied where it is sure of it, colour decides
+    which side the piece belongs to. A colour blob on a square with nothing standing on
+    it is dropped (glare, tape, a sleeve), and a piece colour missed is filled from the
+    colour probabilities or, when they cannot tell, from `fallback`.
+
+    Args:
+        board (np.ndarray): 8x8 colour reading (0 empty, 1 white, -1 black)
+        square_probs (np.ndarray): 8x8x3 [p_empty, p_white, p_black] from colour
+        heights (np.ndarray): 8x8 heights in mm from DepthOccupancy.heights, NaN = unknown
+        fallback (np.ndarray): 8x8 colour to use for occupied squares colour missed
+        threshold (float): Height in mm at which occupied and empty are equally likely
+        softness (float): mm over which the occupancy probability goes from 27% to 73%
+
+    Returns:
+        tuple: (fused 8x8 board, fused 8x8x3 probabilities)
+    """
+    known = np.isfinite(heights)
+    occupied = np.where(known, 1.0 / (1.0 + np.exp(-(np.nan_to_num(heights) - threshold) / softness)), 0.5)
+
+    probs = np.array(square_probs, dtype=np.float64, copy=True)
+    probs[..., 0] *= 1.0 - occupied
+    probs[..., 1:] *= occupied[..., None]
+    probs /= probs.sum(axis=-1, keepdims=True)
+
+    fused = np.array(board, copy=True)
+    fused[known & (occupied < 0.1)] = 0
+    colour = np.where(probs[..., 1] > probs[..., 2], 1, np.where(probs[..., 2] > probs[..., 1], -1, fallback))
+    missed = known & (occupied > 0.9) & (fused == 0)
+    fused[missed] = colour[missed]
+    return fused, probs
@@ -0,0 +1,21 @@
+"""
+Scoring helpers shared by the offline tools (troubleshooting/fit_thresholds.py,
+troubleshooting/train_piece_classifier.py) for empty / white / black square labels.
+"""
+import numpy as np
+from computer_vision.piece_classifier import CLASS_NAMES
+
+
+def confusion_matrix(labels, predicted):
+    """3x3 counts, rows = true class, columns = predicted class"""
+    matrix = np.zeros((3, 3), dtype=int)
+    np.add.at(matrix, (labels, predicted), 1)
+    return matrix
+
+
+def print_confusion(title, matrix):
+    print(title)
+    print(" " * 12 + "".join(f"{name:>8}" for name in CLASS_NAMES))
+    for name, row in zip(CLASS_NAMES, matrix):
+        print(f"{name:>12}" + "".join(f"{count:>8}" for count in row))
+    print(f"accuracy: {np.trace(matrix) / matrix.sum():.4f}\n")
@@ -0,0 +1,132 @@
+import cv2
+import numpy as np
+from computer_vision import square_processing as sp
+
+
+class FrameContext:
+    """
+    Per-frame cache of the colour planes used by the vision pipeline
+
+    The HSV conversion and each colour mask are computed at most once per frame and
+    then shared by corner detection, the board warp and square classification.
+    When a ColourLUT is given the masks come from a single table lookup on the BGR
+    frame instead, and the HSV conversion is skipped.
+    """
+
+    # Name -> (lower, upper) HSV range of every mask the pipeline uses
+    COLOUR_RANGES = {
+        "blue": (sp.BLUE_LOWER, sp.BLUE_UPPER),
+        "pink": (sp.PINK_LOWER, sp.PINK_UPPER),
+        "yellow": (sp.YELLOW_LOWER, sp.YELLOW_UPPER),
+    }
+
+    def __init__(self, image, lut=None):
+        """
+        Args:
+            image (np.ndarray): BGR camera frame
+            lut (ColourLUT): Optional lookup table to segment with instead of HSV ranges
+        """
+        if not isinstance(image, np.ndarray):
+            raise TypeError("FrameContext needs a NumPy BGR image")
+        self.bgr = image
+        self.lut = lut
+        self._hsv = None
+        self._labels = None
+        self._masks = {}
+        self._levels = {}
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def hsv(self):
+        """HSV version of the frame, converted on first use"""
+        if self._hsv is None:
+            self._hsv = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV)
+        return self._hsv
+
+    @property
+    def labels(self):
+        """Per-pixel colour class bits from the LUT, labelled on first use"""
+        if self.lut is None:
+            raise RuntimeError("FrameContext was created without a ColourLUT")
+        if self._labels is None:
+            self._labels = self.lut.label(self.bgr)
+        return self._labels
+
+    def downscaled(self, level):
+        """FrameContext of the frame shrunk by 2**level (area averaged), built on first use"""
+        if level not in self._levels:
+            scale = 1.0 / (1 << level)
+            small = cv2.resize(self.bgr, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            self._levels[level] = FrameContext(small, lut=self.lut)
+        return self._levels[level]
+
+    def has_mask(self, name):
+        """True if the mask for name has already been computed for this frame"""
+        return name in self._masks
+
+    def crop_mask(self, name, x1, y1, x2, y2):
+        """
+        Mask for one of COLOUR_RANGES inside a window only
+
+        Reuses the full-frame mask or HSV image when they already exist, otherwise
+        converts just the window.
+        """
+        if name in self._masks:
+            return self._masks[name][y1:y2, x1:x2]
+        if self.lut is not None:
+            return self.lut.mask(self.lut.label(self.bgr[y1:y2, x1:x2]), name)
+        lower, upper = self.COLOUR_RANGES[name]
+        hsv = self._hsv[y1:y2, x1:x2] if self._hsv is not None else \
+            cv2.cvtColor(self.bgr[y1:y2, x1:x2], cv2.COLOR_BGR2HSV)
+        return cv2.inRange(hsv, lower, upper)
+
+    def mask(self, name):
+        """Binary mask (0/255) for one of COLOUR_RANGES, computed on first use"""
+        if name not in self._masks:
+            if self.lut is not None:
+                self._masks[name] = self.lut.mask(self.labels, name)
+            else:
+                lower, upper = self.COLOUR_RANGES[name]
+                self._masks[name] = cv2.inRange(self.hsv, lower, upper)
+        return self._masks[name]
+
+    def piece_codes(self, x1, y1, x2, y2):
+        """
+        Pink and yellow bits of every pixel in a window, 1 = pink, 2 = yellow
+
+        Uses the LUT labels or the existing masks when they are there, otherwise
+        converts only the window to HSV, once for both colours.
+        """
+        if self.lut is not None:
+            labels = self._labels[y1:y2, x1:x2] if self._labels is not None else \
+                self.lut.label(self.bgr[y1:y2, x1:x2])
+            return labels & 3
+        if "pink" in self._masks and "yellow" in self._masks:
+            pink = self._masks["pink"][y1:y2, x1:x2]
+            yellow = self._masks["yellow"][y1:y2, x1:x2]
+        else:
+            hsv = self._hsv[y1:y2, x1:x2] if self._hsv is not None else \
+                cv2.cvtColor(self.bgr[y1:y2, x1:x2], cv2.COLOR_BGR2HSV)
+            pink = cv2.inRange(hsv, *self.COLOUR_RANGES["pink"])
+            yellow = cv2.inRange(hsv, *self.COLOUR_RANGES["yellow"])
+        return (pink & 1) | (yellow & 2)
+
+    def warp_piece_masks(self, matrix, size):
+        """
+        Warp the pink and yellow masks into board space in a single call
+
+        Nearest-neighbour interpolation keeps the masks binary, so squares can be
+        classified straight from the warped planes without touching BGR again.
+
+        Args:
+            matrix (np.ndarray): 3x3 perspective transform from camera to board image
+            size (tuple): (width, height) of the board image
+
+        Returns:
+            np.ndarray: height x width x 2 array, channel 0 = pink, channel 1 = yellow
+        """
+        planes = cv2.merge([self.mask("pink"), self.mask("yellow")])
+        return cv2.warpPerspective(planes, matrix, size, flags=cv2.INTER_NEAREST)
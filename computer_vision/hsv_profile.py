@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import numpy as np
+from computer_vision.frame_context import FrameContext
+
+log = logging.getLogger(__name__)
+
+# Profiles written by troubleshooting/hsv_calibrator.py, one file per lighting setup
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+# The threshold arrays every stage of the pipeline reads (shared with
+# square_processing). Profiles are applied by writing into these arrays in place,
+# so FrameContext, detect_chess_piece_colour and the colour LUT key all pick up
+# new values without being re-imported.
+LIVE_RANGES = FrameContext.COLOUR_RANGES
+
+
+def profile_path(name):
+    """Path of a named profile inside PROFILE_DIR, or name itself if it is already a .json path"""
+    if name.endswith(".json"):
+        return name
+    return os.path.join(PROFILE_DIR, f"{name}.json")
+
+
+def current_ranges():
+    """Copy of the thresholds currently in use, as {name: (lower, upper)}"""
+    return {name: (lower.copy(), upper.copy()) for name, (lower, upper) in LIVE_RANGES.items()}
+
+
+def save_profile(path, ranges, name=None):
+    """
+    Write a threshold profile as JSON
+
+    Args:
+        path (str): Output file
+        ranges (dict): {name: (lower, upper)} HSV bounds, any subset of LIVE_RANGES
+        name (str): Lighting setup the profile was tuned for
+    """
+    data = {
+        "name": name or os.path.splitext(os.path.basename(path))[0],
+        "ranges": encode_ranges(ranges),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Write then rename so a watcher never reads a half written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_profile(path):
+    """
+    Read a threshold profile
+
+    Returns:
+        dict: {name: (lower, upper)} with lower/upper as length 3 NumPy arrays
+
+    Raises:
+        ValueError: If the file is not valid JSON, names an unknown colour or has malformed bounds
+    """
+    with open(path) as f:
+        data = json.load(f)
+    return decode_ranges(data.get("ranges", {}), f"profile {path}")
+
+
+def encode_ranges(ranges):
+    """{name: (lower, upper)} bounds as the JSON-ready dict stored in profiles"""
+    return {colour: {"lower": [int(v) for v in lower], "upper": [int(v) for v in upper]}
+            for colour, (lower, upper) in ranges.items()}
+
+
+def decode_ranges(data, source="profile"):
+    """
+    Inverse of encode_ranges
+
+    Raises:
+        ValueError: If data names an unknown colour or has malformed bounds
+    """
+    ranges = {}
+    try:
+        for colour, bounds in data.items():
+            if colour not in LIVE_RANGES:
+                raise ValueError(f"Unknown colour '{colour}' in {source}")
+            lower = np.array(bounds["lower"], dtype=LIVE_RANGES[colour][0].dtype)
+            upper = np.array(bounds["upper"], dtype=LIVE_RANGES[colour][1].dtype)
+            if lower.shape != (3,) or upper.shape != (3,):
+                raise ValueError(f"Bounds for '{colour}' in {source} must have 3 values")
+            ranges[colour] = (lower, upper)
+    except (AttributeError, KeyError, TypeError) as e:
+        raise ValueError(f"Malformed {source}: {e!r}") from e
+    return ranges
+
+
+def apply_ranges(ranges):
+    """Overwrite the live thresholds with the given {name: (lower, upper)} bounds"""
+    for colour, (lower, upper) in ranges.items():
+        live_lower, live_upper = LIVE_RANGES[colour]
+        live_lower[:] = lower
+        live_upper[:] = upper
+
+
+class ProfileWatcher:
+    """
+    Loads a profile and re-applies it whenever the file changes on disk
+
+    poll() only stats the file, so it is cheap enough to call from a timer.
+    """
+
+    def __init__(self, path, on_reload=None):
+        """
+        Args:
+            path (str): Profile file to watch
+            on_reload (callable): Called with the new ranges after each (re)load
+        """
+        self.path = path
+        self.on_reload = on_reload
+        self._mtime = None
+
+    def poll(self):
+        """
+        Reload the profile if it changed since the last call
+
+        A profile that cannot be read is logged once per change and the current
+        thresholds are kept, so a bad save never takes the node down.
+
+        Returns:
+            bool: True if new thresholds were applied
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return False
+
+        self._mtime = mtime
+        try:
+            ranges = load_profile(self.path)
+        except (ValueError, OSError) as e:
+            log.error("Keeping current HSV thresholds, could not load profile %s: %s", self.path, e)
+            return False
+        apply_ranges(ranges)
+        if self.on_reload is not None:
+            self.on_reload(ranges)
+        return True
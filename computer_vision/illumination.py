@@ -0,0 +1,152 @@
+import cv2
+import numpy as np
+
+
+class IlluminationNormaliser:
+    """
+    Keeps colour thresholds valid while the lighting drifts
+
+    The mean BGR of light and dark board squares that are known to be empty is
+    tracked with an exponential moving average. Per-channel gains map the current
+    lighting back to the reference lighting the thresholds were tuned under, and
+    are applied to the board area of the next frame with a single cv2.LUT call, so
+    there is no extra per-frame HSV work and no spike when the statistics change.
+    The blue corner markers are found in the uncorrected frame, before the gains
+    are applied, so their thresholds are never shifted.
+    """
+
+    def __init__(self, alpha=0.2, patch=0.3, tolerance=0.02):
+        """
+        Args:
+            alpha (float): EMA weight of each new frame's statistics
+            patch (float): Side of the sampled patch as a fraction of a square
+            tolerance (float): Gains within this of 1.0 are treated as no correction
+        """
+        self.alpha = alpha
+        self.patch = patch
+        self.tolerance = tolerance
+        self.reset()
+
+    def reset(self):
+        """Forget the reference lighting, the next update becomes the new reference"""
+        self.reference = None  # {parity: mean BGR} for light (0) and dark (1) squares
+        self.current = None
+        self.gains = np.ones(3)
+        self._table = None
+        self._centre_cache = (None, None)
+        self._window_cache = (None, None)
+
+    @property
+    def active(self):
+        """True if the current gains change the image at all"""
+        return self._table is not None
+
+    def apply(self, img, matrix, size):
+        """
+        Correct the board area of a BGR frame with the current gains
+
+        Args:
+            img (np.ndarray): BGR camera frame
+            matrix (np.ndarray): Camera -> board perspective transform
+            size (tuple): (width, height) of the board image
+
+        Returns:
+            np.ndarray: A corrected copy, or img itself if no correction is needed
+        """
+        if self._table is None:
+            return img
+        x1, y1, x2, y2 = self._board_window(matrix, size, img.shape)
+        corrected = img.copy()
+        corrected[y1:y2, x1:x2] = cv2.LUT(img[y1:y2, x1:x2], self._table)
+        return corrected
+
+    def update(self, img, matrix, size, empty_squares):
+        """
+        Fold one frame's empty-square colours into the running statistics
+
+        Args:
+            img (np.ndarray): Uncorrected BGR camera frame
+            matrix (np.ndarray): Camera -> board perspective transform
+            size (tuple): (width, height) of the board image
+            empty_squares (np.ndarray): 8x8 bool array of squares known to be empty
+        """
+        centres, radius = self._square_centres(matrix, size)
+        h, w = img.shape[:2]
+
+        sums = {0: np.zeros(3), 1: np.zeros(3)}
+        counts = {0: 0, 1: 0}
+        for row, col in zip(*np.nonzero(empty_squares)):
+            x, y = centres[row, col]
+            x1, y1 = max(int(x - radius), 0), max(int(y - radius), 0)
+            x2, y2 = min(int(x + radius) + 1, w), min(int(y + radius) + 1, h)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            parity = (row + col) % 2
+            sums[parity] += img[y1:y2, x1:x2].reshape(-1, 3).mean(axis=0)
+            counts[parity] += 1
+
+        observed = {p: sums[p] / counts[p] for p in (0, 1) if counts[p] > 0}
+        if not observed:
+            return
+
+        if self.current is None:
+            self.current = dict(observed)
+        else:
+            for parity, mean in observed.items():
+                previous = self.current.get(parity, mean)
+                self.current[parity] = (1 - self.alpha) * previous + self.alpha * mean
+
+        if self.reference is None:
+            self.reference = dict(self.current)
+            return
+        self._update_gains()
+
+    def _update_gains(self):
+        ratios = [self.reference[p] / np.maximum(self.current[p], 1.0)
+                  for p in (0, 1) if p in self.reference and p in self.current]
+        if not ratios:
+            return
+        self.gains = np.mean(ratios, axis=0)
+
+        if np.all(np.abs(self.gains - 1.0) < self.tolerance):
+            self._table = None
+            return
+        levels = np.arange(256, dtype=np.float64)[:, None] * self.gains[None, :]
+        self._table = np.clip(levels, 0, 255).astype(np.uint8).reshape(256, 1, 3)
+
+    def _board_window(self, matrix, size, shape):
+        """Camera-space bounding box (x1, y1, x2, y2) of the board, cached per warp"""
+        key = (matrix.tobytes(), tuple(size), shape[:2])
+        if self._window_cache[0] == key:
+            return self._window_cache[1]
+
+        width, height = size
+        board_rect = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float32)
+        quad = cv2.perspectiveTransform(board_rect.reshape(-1, 1, 2), np.linalg.inv(matrix)).reshape(-1, 2)
+        h, w = shape[:2]
+        x1, y1 = max(int(np.floor(quad[:, 0].min())), 0), max(int(np.floor(quad[:, 1].min())), 0)
+        x2, y2 = min(int(np.ceil(quad[:, 0].max())) + 1, w), min(int(np.ceil(quad[:, 1].max())) + 1, h)
+        window = (x1, y1, max(x2, x1), max(y2, y1))
+
+        self._window_cache = (key, window)
+        return window
+
+    def _square_centres(self, matrix, size):
+        """Camera-space centre of every square and the patch radius, cached per warp"""
+        key = (matrix.tobytes(), tuple(size))
+        if self._centre_cache[0] == key:
+            return self._centre_cache[1]
+
+        width, height = size
+        cols, rows = np.meshgrid(np.arange(8), np.arange(8))
+        board_pts = np.stack([(cols + 0.5) * width / 8, (rows + 0.5) * height / 8], axis=-1)
+        camera_pts = cv2.perspectiveTransform(
+            board_pts.reshape(-1, 1, 2).astype(np.float32), np.linalg.inv(matrix))
+        centres = camera_pts.reshape(8, 8, 2)
+
+        # Approximate the patch size from the mean square pitch in camera space
+        pitch = np.mean(np.linalg.norm(np.diff(centres, axis=1), axis=-1))
+        radius = max(1.0, pitch * self.patch / 2)
+
+        self._centre_cache = (key, (centres, radius))
+        return centres, radius
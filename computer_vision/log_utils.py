@@ -0,0 +1,109 @@
+"""
+Logging for the vision and move-detection modules.
+
+Modules log through the standard library with `logging.getLogger(__name__)` and
+%-style arguments, so nothing is formatted unless the record is emitted. Values
+that are expensive to build (FEN strings, board dumps) are wrapped in `lazy` so
+they are only computed when their level is enabled:
+
+    log.debug("Current board: %s", lazy(self.board.fen))
+
+`configure` installs one handler on the computer_vision logger with per-module
+levels and a rate limit, so a message repeated every frame cannot flood the
+ROS-captured output:
+
+    log_utils.configure("INFO", {"computer_vision.python_chess3": "DEBUG"})
+"""
+import logging
+import sys
+import time
+
+ROOT = "computer_vision"
+
+
+class lazy:
+    """Defers a call until the log record is actually formatted"""
+    __slots__ = ("func",)
+
+    def __init__(self, func):
+        self.func = func
+
+    def __str__(self):
+        return str(self.func())
+
+    __repr__ = __str__
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `burst` records per message template through every `period` seconds
+
+    The number of suppressed records is appended to the next one let through.
+    """
+
+    def __init__(self, period=1.0, burst=5):
+        super().__init__()
+        self.period = period
+        self.burst = burst
+        self._windows = {}  # (logger, template) -> [window start, emitted, suppressed]
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.period:
+            suppressed = window[2] if window is not None else 0
+            window = self._windows[key] = [now, 0, 0]
+            if suppressed:
+                record.msg = f"{record.msg} ({suppressed} similar suppressed)"
+        if window[1] >= self.burst:
+            window[2] += 1
+            return False
+        window[1] += 1
+        return True
+
+
+def parse_levels(spec):
+    """
+    Parse "INFO" or "INFO,computer_vision.python_chess3=DEBUG" into (default, {module: level})
+    """
+    default, levels = None, {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        if "=" in part:
+            name, level = part.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+        else:
+            default = part.upper()
+    return default, levels
+
+
+def configure(level="INFO", levels=None, period=1.0, burst=5, stream=None):
+    """
+    Send computer_vision log records to a stream with per-module levels and rate limiting
+
+    Args:
+        level (str): Level of the computer_vision logger
+        levels (dict): {module logger name: level} overrides
+        period (float): Rate limit window in seconds (0 disables rate limiting)
+        burst (int): Records per message template allowed in each window
+        stream: Output stream, stderr by default
+
+    Returns:
+        logging.Logger: The configured computer_vision logger
+    """
+    root = logging.getLogger(ROOT)
+    root.setLevel(level)
+    for name, module_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    for handler in list(root.handlers):
+        if getattr(handler, "_computer_vision", False):
+            root.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter("[%(levelname)s] [%(name)s]: %(message)s"))
+    if period > 0:
+        handler.addFilter(RateLimitFilter(period, burst))
+    handler._computer_vision = True
+    root.addHandler(handler)
+    root.propagate = False
+    return root
@@ -0,0 +1,220 @@
+import numpy as np
+import chess
+
+
+def square_to_index(square):
+    """
+    Convert a python-chess square to a (row, col) index into a colour array
+    (row 0 is rank 8, matching board_to_color_array)
+    """
+    return 7 - chess.square_rank(square), chess.square_file(square)
+
+
+def color_changes(board, move):
+    """
+    List the colour array squares that change when a move is played
+
+    Only the squares touched by the move are returned, so a candidate move can be
+    scored without pushing it and rebuilding the full 8x8 array.
+
+    Args:
+        board (chess.Board): Position before the move
+        move (chess.Move): A legal move in that position
+
+    Returns:
+        list: (row, col, new_value) tuples with 0 = empty, 1 = white, -1 = black
+    """
+    value = 1 if board.turn == chess.WHITE else -1
+    changes = [
+        (*square_to_index(move.from_square), 0),
+        (*square_to_index(move.to_square), value),
+    ]
+
+    if board.is_en_passant(move):
+        captured = chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square))
+        changes.append((*square_to_index(captured), 0))
+    elif board.is_castling(move):
+        rank = chess.square_rank(move.from_square)
+        if board.is_kingside_castling(move):
+            rook_from, rook_to = chess.square(7, rank), chess.square(5, rank)
+        else:
+            rook_from, rook_to = chess.square(0, rank), chess.square(3, rank)
+        changes.append((*square_to_index(rook_from), 0))
+        changes.append((*square_to_index(rook_to), value))
+
+    return changes
+
+
+def match_moves(board, color_array, observed, max_mismatches=4):
+    """
+    Find the legal moves whose colour changes explain an observed colour array
+
+    Each move is compared through its change template from color_changes(), so
+    castling (4 squares), en passant (3 squares) and promotions are matched in
+    the same single pass as ordinary moves, without pushing any move.
+
+    Every square a candidate touches must read as the move predicts; only changed
+    squares outside the move count towards max_mismatches. A single misread square
+    can then never pass for a move on its own.
+
+    Args:
+        board (chess.Board): Position before the move
+        color_array (np.ndarray): Colour array of that position
+        observed (np.ndarray): Colour array read after the move
+        max_mismatches (int): Changed squares outside a candidate's own squares allowed
+
+    Returns:
+        list: (move, matching_squares) tuples, best first; moves with equal scores
+              keep python-chess move order, so promotion variants stay together
+    """
+    changed = {(row, col) for row, col in zip(*np.nonzero(np.asarray(color_array) != observed))}
+
+    scored = []
+    for move in board.legal_moves:
+        predicted = {(row, col): value for row, col, value in color_changes(board, move)}
+        # Squares the move touches must read as predicted, every other changed square is noise
+        if any(observed[square] != value for square, value in predicted.items()):
+            continue
+        mismatches = sum(1 for square in changed if square not in predicted)
+        if mismatches <= max_mismatches:
+            scored.append((move, 64 - mismatches))
+
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored
+
+
+def match_sequences(board, color_array, observed, depth=2, max_mismatches=1):
+    """
+    Find legal move sequences of a fixed length that explain an observed colour array
+
+    Used when frames were missed and several plies happened between readings.
+    A move is only tried if it starts on a square that changed between the two
+    readings or that an earlier move of the sequence touched, and a branch is cut
+    as soon as the remaining moves cannot fix the squares still disagreeing.
+
+    Args:
+        board (chess.Board): Position before the first move
+        color_array (np.ndarray): Colour array of that position
+        observed (np.ndarray): Colour array read after the last move
+        depth (int): Number of plies in each sequence
+        max_mismatches (int): Squares allowed to disagree with the final position
+
+    Returns:
+        list: (moves, matching_squares) tuples, best first
+    """
+    observed = np.asarray(observed)
+    working = np.array(color_array, copy=True)
+    changed = {(int(row), int(col)) for row, col in zip(*np.nonzero(working != observed))}
+    board = board.copy()
+    sequence = []
+    results = []
+
+    def search(touched):
+        mismatches = int(np.count_nonzero(working != observed))
+        remaining = depth - len(sequence)
+        if remaining == 0:
+            if mismatches <= max_mismatches:
+                results.append((list(sequence), 64 - mismatches))
+            return
+        # A move rewrites at most 4 squares (castling)
+        if mismatches > 4 * remaining + max_mismatches:
+            return
+
+        for move in board.legal_moves:
+            if square_to_index(move.from_square) not in touched:
+                continue
+            changes = color_changes(board, move)
+            saved = [(row, col, working[row, col]) for row, col, _ in changes]
+            for row, col, value in changes:
+                working[row, col] = value
+            board.push(move)
+            sequence.append(move)
+
+            search(touched | {(row, col) for row, col, _ in changes})
+
+            sequence.pop()
+            board.pop()
+            for row, col, value in saved:
+                working[row, col] = value
+
+    search(changed)
+    results.sort(key=lambda x: x[1], reverse=True)
+    return results
+
+
+def log_probabilities(square_probs, eps=1e-6):
+    """
+    Convert per-square class probabilities to clipped log probabilities
+
+    Args:
+        square_probs (np.ndarray): 8x8x3 array of [p_empty, p_white, p_black]
+
+    Returns:
+        np.ndarray: 8x8x3 array of log probabilities
+    """
+    square_probs = np.asarray(square_probs, dtype=np.float64)
+    if square_probs.shape != (8, 8, 3):
+        raise ValueError(f"square_probs must have shape (8, 8, 3), got {square_probs.shape}")
+    return np.log(np.clip(square_probs, eps, 1.0))
+
+
+def board_log_likelihood(color_array, log_probs):
+    """Log-likelihood of an observed reading given the board is exactly color_array"""
+    classes = np.asarray(color_array) % 3  # 0 -> 0, 1 -> 1, -1 -> 2
+    rows, cols = np.indices((8, 8))
+    return float(log_probs[rows, cols, classes].sum())
+
+
+def rank_moves(board, color_array, log_probs, k=3):
+    """
+    Rank the legal moves in a position by how well they explain a board reading
+
+    Args:
+        board (chess.Board): Position before the move
+        color_array (np.ndarray): Colour array of that position
+        log_probs (np.ndarray): 8x8x3 log probabilities from log_probabilities()
+        k (int): Number of candidates to return
+
+    Returns:
+        list: Up to k (move, log_likelihood) tuples, best first
+    """
+    base = board_log_likelihood(color_array, log_probs)
+    classes = np.asarray(color_array) % 3
+
+    scored = []
+    for move in board.legal_moves:
+        delta = 0.0
+        for row, col, value in color_changes(board, move):
+            delta += log_probs[row, col, value % 3] - log_probs[row, col, classes[row, col]]
+        scored.append((move, base + delta))
+
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored[:k]
+
+
+def disputed_squares(board, candidates):
+    """
+    Find the squares on which the candidate moves disagree
+
+    Re-reading only these squares is enough to separate the candidates.
+
+    Args:
+        board (chess.Board): Position before the move
+        candidates (list): (move, score) tuples from rank_moves()
+
+    Returns:
+        list: Sorted (row, col) tuples
+    """
+    predictions = [
+        {(row, col): value for row, col, value in color_changes(board, move)}
+        for move, _ in candidates
+    ]
+    touched = set().union(*predictions) if predictions else set()
+
+    disputed = []
+    for square in touched:
+        # None stands for "unchanged"; a move never writes a square's current value back
+        values = {prediction.get(square) for prediction in predictions}
+        if len(values) > 1:
+            disputed.append(square)
+    return sorted(disputed)
@@ -0,0 +1,224 @@
+"""
+Local CPU classifier for square crops: empty, white or black (optionally by piece type).
+
+A replacement for the hosted detection API once tried in depreciated/ - it runs
+offline and classifies all 64 squares of a frame in one batch:
+
+    crops = board_crops(frame, matrix, size, game._square_bounds)  # one cv2.remap
+    probs = classifier.predict(crops)                               # (64, classes)
+
+The model is a softmax regression over per-crop HSV histograms, so inference is a
+cvtColor, a bincount and one matrix product with NumPy only. It is trained by
+troubleshooting/train_piece_classifier.py from recorded, auto-labelled sessions and
+stored as a .npz file.
+"""
+import logging
+import os
+import cv2
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Default model written by train_piece_classifier.py
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+DEFAULT_MODEL = os.path.join(MODEL_DIR, "piece_classifier.npz")
+
+CLASS_NAMES = ["empty", "white", "black"]
+
+# Side of the square crops fed to the model
+CROP_SIZE = 16
+# HSV histogram bins per channel
+HUE_BINS, SAT_BINS, VAL_BINS = 12, 3, 3
+
+
+def square_grid(matrix, size, bounds, crop=CROP_SIZE):
+    """
+    Camera coordinates of a crop x crop sample grid over each padded square
+
+    Args:
+        matrix (np.ndarray): 3x3 camera -> board image transform
+        size (tuple): (width, height) of the board image
+        bounds: Function (row, col, width, height) -> padded (x1, y1, x2, y2), e.g. game._square_bounds
+
+    Returns:
+        tuple: (map_x, map_y) float32 arrays of shape (64 * crop, crop) for cv2.remap
+    """
+    width, height = size
+    steps = (np.arange(crop) + 0.5) / crop
+    points = np.empty((64, crop, crop, 2), dtype=np.float64)
+    for index in range(64):
+        x1, y1, x2, y2 = bounds(index // 8, index % 8, width, height)
+        xs = x1 - 0.5 + steps * (x2 - x1)
+        ys = y1 - 0.5 + steps * (y2 - y1)
+        points[index, ..., 0] = xs[None, :]
+        points[index, ..., 1] = ys[:, None]
+    camera = cv2.perspectiveTransform(points.reshape(-1, 1, 2), np.linalg.inv(matrix)).reshape(64 * crop, crop, 2)
+    return camera[..., 0].astype(np.float32), camera[..., 1].astype(np.float32)
+
+
+def board_crops(image, matrix, size, bounds, crop=CROP_SIZE):
+    """
+    All 64 padded square crops of a camera frame, resampled straight from the camera image
+
+    Returns:
+        np.ndarray: (64, crop, crop, 3) BGR crops, squares in row-major board order
+    """
+    map_x, map_y = square_grid(matrix, size, bounds, crop)
+    batch = cv2.remap(image, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    return batch.reshape(64, crop, crop, 3)
+
+
+def crop_features(crops):
+    """
+    Feature vectors of a batch of equally sized BGR crops
+
+    Square-rooted HSV histograms (hue x saturation x value) plus the mean and spread
+    of saturation and value, computed for the whole batch with one cvtColor and one
+    bincount.
+
+    Returns:
+        np.ndarray: (n, HUE_BINS * SAT_BINS * VAL_BINS + 4) float32
+    """
+    crops = np.asarray(crops, dtype=np.uint8)
+    count, pixels = crops.shape[0], crops.shape[1] * crops.shape[2]
+    hsv = cv2.cvtColor(crops.reshape(-1, crops.shape[2], 3), cv2.COLOR_BGR2HSV).reshape(count, pixels, 3)
+
+    bins = HUE_BINS * SAT_BINS * VAL_BINS
+    hue = hsv[..., 0].astype(np.int64) * HUE_BINS // 180
+    sat = hsv[..., 1].astype(np.int64) * SAT_BINS // 256
+    val = hsv[..., 2].astype(np.int64) * VAL_BINS // 256
+    codes = (hue * SAT_BINS + sat) * VAL_BINS + val + np.arange(count)[:, None] * bins
+    hist = np.bincount(codes.ravel(), minlength=count * bins).reshape(count, bins) / pixels
+
+    sv = hsv[..., 1:].astype(np.float32) / 255.0
+    stats = np.concatenate([sv.mean(axis=1), sv.std(axis=1)], axis=1)
+    return np.concatenate([np.sqrt(hist), stats], axis=1).astype(np.float32)
+
+
+def piece_colour(name):
+    """"white" or "black" for a class name such as "white" or "white_pawn", None for empty"""
+    side = name.split("_")[0]
+    return side if side in ("white", "black") else None
+
+
+class PieceClassifier:
+    """Softmax regression over crop_features, trained with train()"""
+
+    def __init__(self, weights, bias, mean, scale, classes=CLASS_NAMES, crop=CROP_SIZE):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.classes = [str(name) for name in classes]
+        self.crop = int(crop)
+        # Class -> [empty, white, black] column, to report colour probabilities for piece-type models
+        colours = [piece_colour(name) for name in self.classes]
+        self._colour_index = np.array([0 if c is None else (1 if c == "white" else 2) for c in colours])
+
+    @classmethod
+    def train(cls, crops, labels, classes=CLASS_NAMES, epochs=400, learning_rate=0.05, l2=1e-4):
+        """
+        Fit the model to labelled crops with full-batch Adam
+
+        Args:
+            crops (np.ndarray): (n, crop, crop, 3) BGR crops
+            labels (np.ndarray): Class index per crop
+            classes (list): Class names, see piece_colour
+        """
+        features = crop_features(crops).astype(np.float64)
+        labels = np.asarray(labels, dtype=np.int64)
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0) + 1e-6
+        x = (features - mean) / scale
+        target = np.eye(len(classes))[labels]
+
+        weights = np.zeros((x.shape[1], len(classes)))
+        bias = np.zeros(len(classes))
+        moments = [np.zeros_like(weights), np.zeros_like(bias)]
+        squares = [np.zeros_like(weights), np.zeros_like(bias)]
+        # Classes are weighted equally, boards are mostly empty squares
+        weight = (len(labels) / (len(classes) * np.maximum(np.bincount(labels, minlength=len(classes)), 1)))[labels]
+        for step in range(1, epochs + 1):
+            probs = _softmax(x @ weights + bias)
+            error = (probs - target) * weight[:, None] / len(labels)
+            grads = [x.T @ error + l2 * weights, error.sum(axis=0)]
+            for param, grad, m, v in zip((weights, bias), grads, moments, squares):
+                m *= 0.9
+                m += 0.1 * grad
+                v *= 0.999
+                v += 0.001 * grad ** 2
+                param -= learning_rate * (m / (1 - 0.9 ** step)) / (np.sqrt(v / (1 - 0.999 ** step)) + 1e-8)
+        return cls(weights, bias, mean, scale, classes, crops.shape[1])
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL):
+        """Read a model saved with save()"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["weights"], data["bias"], data["mean"], data["scale"],
+                       list(data["classes"]), int(data["crop"]))
+
+    def save(self, path=DEFAULT_MODEL):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(path, weights=self.weights, bias=self.bias, mean=self.mean, scale=self.scale,
+                 classes=np.array(self.classes), crop=self.crop)
+
+    def predict(self, crops):
+        """
+        Class probabilities of a batch of crops
+
+        Returns:
+            np.ndarray: (n, len(classes)) probabilities
+        """
+        x = (crop_features(crops) - self.mean) / self.scale
+        return _softmax(x @ self.weights + self.bias)
+
+    def colour_probabilities(self, probs):
+        """Collapse class probabilities to [p_empty, p_white, p_black]"""
+        collapsed = np.zeros((probs.shape[0], 3), dtype=np.float64)
+        np.add.at(collapsed.T, self._colour_index, probs.T)
+        return collapsed
+
+    def classify_board(self, image, matrix, size, bounds):
+        """
+        Classify all 64 squares of a camera frame in one batch
+
+        Returns:
+            tuple: (8x8 board array, 8x8x3 [p_empty, p_white, p_black] probabilities)
+        """
+        probs = self.colour_probabilities(self.predict(board_crops(image, matrix, size, bounds, self.crop)))
+        values = np.array([0, 1, -1], dtype=np.int8)[probs.argmax(axis=1)]
+        return values.reshape(8, 8), probs.reshape(8, 8, 3)
+
+    def detect_chess_piece_colour(self, image_input, DEBUG=False):
+        """
+        Drop-in for square_processing.detect_chess_piece_colour on a single square image
+
+        Returns:
+            tuple: (piece_detected, color, output_image) with color "white", "black" or None
+        """
+        if isinstance(image_input, str):
+            image = cv2.imread(image_input)
+        elif isinstance(image_input, np.ndarray):
+            image = image_input
+        else:
+            raise ValueError("image_input must be a file path or a numpy.ndarray")
+        if image is None:
+            raise ValueError("Failed to load image.")
+
+        crop = cv2.resize(image, (self.crop, self.crop), interpolation=cv2.INTER_LINEAR)
+        probs = self.predict(crop[None])[0]
+        name = self.classes[int(probs.argmax())]
+        piece_color = piece_colour(name)
+
+        output = image.copy()
+        if piece_color is not None:
+            cv2.putText(output, f"{name} {probs.max():.2f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        if DEBUG:
+            log.info("Detected: %s, class: %s, p=%.2f", piece_color is not None, name, probs.max())
+        return piece_color is not None, piece_color, output
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
@@ -2,10 +2,21 @@ import numpy as np
 import chess
 import chess.pgn
 from typing import Tuple, Optional, List
-import matplotlib.pyplot as plt
 import cv2
 import re
+import logging
+from collections.abc import ItemsView, KeysView, ValuesView
 from computer_vision import square_processing as sp
+from computer_vision import move_decoding as md
+from computer_vision.frame_context import FrameContext
+from computer_vision import board_calibration
+from computer_vision.colour_lut import get_colour_lut
+from computer_vision.square_sampling import SquareSampler
+from computer_vision.depth_occupancy import DepthOccupancy, fuse_depth
+from computer_vision import timing
+from computer_vision.log_utils import lazy
+
+log = logging.getLogger(__name__)
 
 class game:
     def __init__(self, initial_fen=None):
@@ -31,14 +42,81 @@ class game:
         self.game.headers["White"] = "Player 1"
         self.game.headers["Black"] = "Player 2"
         self.game.headers["Result"] = "*"
+        if initial_fen:
+            # SetUp/FEN headers, so the PGN replays from the position the game started in
+            self.game.setup(self.board)
         self.current_node = self.game
+
+        # PGN movetext, one (move number, white moved, SAN) entry per ply, appended as
+        # moves are committed
+        self.movetext = []
         
         # Keep track of the previous board state as a NumPy array
         self.previous_board_array = self.board_to_color_array(self.board)
+
+        # Per-square [p_empty, p_white, p_black] from the last analysed image, and the
+        # warp used to produce it so single squares can be re-read later
+        self.square_probabilities = None
+        self.warp_matrix = None
+        self.warp_size = None
+
+        # Bins per channel of the BGR colour lookup table, None segments with HSV ranges
+        self.colour_lut_bins = None
+
+        # "warp" classifies squares from the warped board image, "camera" counts colours in
+        # square regions projected into the camera frame (see camera_sampler)
+        self.square_sampling = "warp"
+        self.square_sampler = None
+        # Corner movement in pixels tolerated before the camera-space regions are rebuilt
+        self.sampler_tolerance = 1.0
+        # Height of the coloured piece tops in squares (e.g. 0.8 for tops 32 mm above 40 mm
+        # squares). Camera sampling lays its regions out on that plane so tops leaning into
+        # the next square in an angled view are still read on their own square
+        self.piece_height = 0.0
+        # Camera focal length in pixels for that correction, estimated from the warp if None
+        self.camera_focal_length = None
+
+        # Optional piece_classifier.PieceClassifier used instead of the colour thresholds
+        self.piece_classifier = None
+
+        # Depth occupancy, used when analyze_chessboard is given an aligned depth frame in mm
+        self.depth_occupancy = None
+        self.depth_threshold = 12.0  # mm above the board plane at which a square counts as occupied
+        self.depth_step = 4          # Sample every n-th depth pixel
+        self.square_heights = None   # 8x8 mm heights of the last reading with depth
+
+        # Optional IlluminationNormaliser applied to each frame before colour classification
+        self.illumination = None
+
+        # Piece chosen when a detected promotion could be any piece (see choose_promotion)
+        self.promotion_piece = chess.QUEEN
+
+        # Matching squares of the last single move found by detect_move
+        self.match_score = 0
+
+        # Most plies searched when a reading can only be explained by missed moves
+        self.max_recovery_depth = 3
+
+        # Coarsest image pyramid level the blue marker search starts from (2 = quarter size)
+        self.marker_pyramid_level = 2
+
+        # Corner fallback state used when the blue markers are not all found (see resolve_corners)
+        self.last_good_corners = None
+        self.corner_sightings = [None] * 4  # (frame number, point) per corner, TL, TR, BL, BR
+        self.corner_frame = 0
+        self.corner_failures = 0
+        self.temporal_frames = 5
+        # Pixels a visible marker may be from the last good corner before those corners are stale
+        self.corner_tolerance = 10.0
+        # Called with no arguments when only an operator can supply the corners, e.g. to
+        # publish a request; the answer is passed to set_operator_corners
+        self.operator_request = None
+        self.operator_requested = False
     
     ############chess_2 methods##################################
     
-    def board_to_color_array(self, board):
+    @staticmethod
+    def board_to_color_array(board):
         """
         Convert a python-chess board to an 8x8 NumPy array showing only piece colors
         
@@ -64,52 +142,60 @@ class game:
     
     def detect_move(self, new_color_array):
         """Detect the move by comparing the previous and new board states with color-only arrays"""
-        # Find changed squares
-        changed_squares = np.where(self.previous_board_array != new_color_array)
-        changed_rows, changed_cols = changed_squares
-        
-        if len(changed_rows) < 2:
-            # No move detected or invalid
+        # Find changed squares; every move changes at least two
+        current_array = self.board_to_color_array(self.board)
+        if np.count_nonzero(current_array != new_color_array) < 2:
+            # No move detected
+            self.match_score = 0
             return None
         
-        # Find candidate moves
-        candidate_moves = []
-        
-        # Get all legal moves from current board position
-        for move in self.board.legal_moves:
-            # Make the move on a temporary board
-            temp_board = chess.Board(self.board.fen())
-            temp_board.push(move)
-            
-            # Convert to color array and compare with new_color_array
-            temp_array = self.board_to_color_array(temp_board)
-            
-            # Calculate number of matching positions
-            matches = np.sum(temp_array == new_color_array)
-            total_squares = 64
-            
-            # Add to candidates with match score
-            if matches >= (total_squares - 4):  # Allow for some discrepancy
-                candidate_moves.append((move, matches))
-                
-                # Debug information
-                if matches == total_squares:
-                    print(f"Perfect match found: {move}")
+        # Match every legal move's change template (castling, en passant and
+        # promotion included) against the observation, allowing some discrepancy
+        # on squares the move does not touch
+        candidate_moves = md.match_moves(self.board, current_array, new_color_array, max_mismatches=4)
         
         # If no candidates found, return None
         if not candidate_moves:
-            print("No candidate moves found that match the new board state")
-            # Print current board FEN for debugging
-            print(f"Current board: {self.board.fen()}")
+            self.match_score = 0
+            log.info("No candidate moves found that match the new board state")
+            log.debug("Current board: %s", lazy(self.board.fen))
             return None
         
         # Get the best match
-        best_match = max(candidate_moves, key=lambda x: x[1])
-        best_move, match_score = best_match
+        best_move, match_score = candidate_moves[0]
+        self.match_score = match_score
         
-        print(f"Best move match: {best_move} with {match_score}/{64} matching squares")
+        # Promotion pieces give identical colour arrays, let choose_promotion pick one
+        if best_move.promotion:
+            promotions = [move for move, score in candidate_moves
+                          if score == match_score and move.from_square == best_move.from_square
+                          and move.to_square == best_move.to_square]
+            best_move = self.choose_promotion(promotions)
+        
+        if match_score == 64:
+            log.debug("Perfect match found: %s", best_move)
+        log.debug("Best move match: %s with %d/64 matching squares", best_move, match_score)
         
         return best_move
+
+    def choose_promotion(self, moves):
+        """
+        Pick one of several promotion moves that differ only in the promoted piece
+
+        Uses self.promotion_piece when available, otherwise a queen. Override or
+        reassign this to ask the player instead.
+
+        Args:
+            moves: chess.Move promotions sharing the same from and to squares
+
+        Returns:
+            The chosen chess.Move
+        """
+        for piece in (self.promotion_piece, chess.QUEEN):
+            for move in moves:
+                if move.promotion == piece:
+                    return move
+        return moves[0]
     
     def update_board(self, new_color_array, forced_turn=None):
         """
@@ -121,30 +207,113 @@ class game:
                          If None, uses the internal turn tracking
         """
         # Use forced turn if provided, otherwise use internal tracking
-        if forced_turn is not None:
-            actual_turn = forced_turn
-            
-            # If we're forcing a specific turn, adjust the board's turn if needed
-            if actual_turn != self.board.turn:
-                print(f"Adjusting turn to {'White' if actual_turn == chess.WHITE else 'Black'}")
-                # Create a new board with the same position but different turn
-                new_fen_parts = self.board.fen().split()
-                new_fen_parts[1] = 'w' if actual_turn == chess.WHITE else 'b'
-                new_fen = ' '.join(new_fen_parts)
-                self.board = chess.Board(new_fen)
+        turn_forced = forced_turn is not None and forced_turn != self.board.turn
+        if turn_forced:
+            log.info("Adjusting turn to %s", "White" if forced_turn == chess.WHITE else "Black")
+            self.pass_turn()
         
         # Detect move
         move = self.detect_move(new_color_array)
         
+        if move is None or self.match_score <= 62:
+            # Frames may have been missed, look for several plies explaining the change.
+            # A single move leaving two or more changed squares unexplained (e4 and e5 in
+            # one reading match e4 on 62 squares) only gives way to a sequence explaining
+            # every square, so one misread square never adds a ply nobody played
+            pgn_move = self.recover_missed_moves(new_color_array, min_score=0 if move is None else 64)
+            if pgn_move is not None:
+                return pgn_move
+
         if move is None:
             # No valid move detected
-            print("No valid move detected")
+            log.info("No valid move detected")
+            if turn_forced:
+                self.undo_pass_turn()
             return None
         
+        return self.commit_move(move, new_color_array)
+
+    def pass_turn(self):
+        """
+        Give the move to the other side by playing a null move
+
+        Unlike rebuilding the board from an edited FEN this keeps the move stack,
+        so repetition detection and undo still work. The null move also goes into
+        the game tree, but get_pgn leaves it out: a turn override is a correction
+        of the tracking, not a move anyone played.
+        """
+        self.board.push(chess.Move.null())
+        self.current_node = self.current_node.add_variation(chess.Move.null())
+        self._append_movetext("--")
+
+    def undo_pass_turn(self):
+        """Take back a null move played by pass_turn"""
+        self.board.pop()
+        self.movetext.pop()
+        parent = self.current_node.parent
+        parent.remove_variation(self.current_node)
+        self.current_node = parent
+
+    def recover_missed_moves(self, new_color_array, min_score=0):
+        """
+        Resynchronise after missed frames by finding 2 to max_recovery_depth plies
+        that lead from the current position to the observed board state
+
+        All recovered moves are played and added to the PGN.
+
+        Args:
+            new_color_array: Current observed board state as NumPy array (color only)
+            min_score: Fewest matching squares a sequence needs to be accepted
+
+        Returns:
+            PGN formatted notation of the last recovered move, or None if no unique
+            sequence explains the observation
+        """
+        current_array = self.board_to_color_array(self.board)
+        for depth in range(2, self.max_recovery_depth + 1):
+            sequences = md.match_sequences(self.board, current_array, new_color_array, depth=depth)
+            sequences = [(moves, score) for moves, score in sequences if score >= min_score]
+            if sequences:
+                break
+        else:
+            return None
+
+        # Equally good sequences must at least agree on the resulting position
+        best_score = sequences[0][1]
+        outcomes = set()
+        for moves, score in sequences:
+            if score == best_score:
+                board = self.board.copy(stack=False)
+                for move in moves:
+                    board.push(move)
+                outcomes.add(board.board_fen())
+        if len(outcomes) > 1:
+            log.warning("Ambiguous missed moves, %d positions match", len(outcomes))
+            return None
+
+        moves = sequences[0][0]
+        log.warning("Recovered missed moves: %s", lazy(lambda: " ".join(move.uci() for move in moves)))
+        for move in moves[:-1]:
+            expected = self.board.copy(stack=False)
+            expected.push(move)
+            self.commit_move(move, self.board_to_color_array(expected))
+        return self.commit_move(moves[-1], new_color_array)
+
+    def commit_move(self, move, new_color_array):
+        """
+        Play a detected move on the board and record it in the PGN
+
+        Args:
+            move: chess.Move to play
+            new_color_array: Observed board state the move was detected from
+
+        Returns:
+            PGN formatted move notation, or None if the move is not legal
+        """
         try:
             # Check if move is legal in current position
             if move not in self.board.legal_moves:
-                print(f"Move {move} is not legal in current position")
+                log.warning("Move %s is not legal in current position", move)
                 return None
             
             # Get SAN notation of the move before pushing it
@@ -155,6 +324,7 @@ class game:
             
             # Add the move to the PGN
             self.current_node = self.current_node.add_variation(move)
+            self._append_movetext(san_move)
             
             # Update previous board array
             self.previous_board_array = new_color_array.copy()
@@ -169,13 +339,11 @@ class game:
             else:
                 pgn_move = san_move
             
-            print(f"Successfully updated board with move: {move}")
+            log.info("Successfully updated board with move: %s", move)
             return pgn_move
             
         except Exception as e:
-            print(f"Error updating board: {e}")
-            print(f"Current FEN: {self.board.fen()}")
-            print(f"Attempted move: {move}")
+            log.error("Error updating board: %s (FEN %s, attempted move %s)", e, lazy(self.board.fen), move)
             return None
     
        
@@ -202,54 +370,22 @@ class game:
         black_before = np.sum(current_color_array == -1)
         black_after = np.sum(new_color_array == -1)
         
-        # If white piece count changed, likely white moved
-        if white_before != white_after:
-            return chess.WHITE
-        
-        # If black piece count changed, likely black moved
-        if black_before != black_after:
+        # A capture removes a piece of the side that did not move
+        if white_after < white_before:
             return chess.BLACK
         
+        if black_after < black_before:
+            return chess.WHITE
+        
         # If piece counts didn't change, try both turns and see which one gives legal moves
-        white_board = chess.Board(self.board.fen())
-        if white_board.turn != chess.WHITE:
-            # Force white turn
-            fen_parts = white_board.fen().split()
-            fen_parts[1] = 'w'
-            white_board = chess.Board(' '.join(fen_parts))
-            
-        black_board = chess.Board(self.board.fen())
-        if black_board.turn != chess.BLACK:
-            # Force black turn
-            fen_parts = black_board.fen().split()
-            fen_parts[1] = 'b'
-            black_board = chess.Board(' '.join(fen_parts))
-        
-        # Try to find moves for white
-        white_moves = []
-        for move in white_board.legal_moves:
-            temp_board = chess.Board(white_board.fen())
-            temp_board.push(move)
-            temp_array = self.board_to_color_array(temp_board)
-            
-            # Calculate match score
-            match_score = np.sum(temp_array == new_color_array)
-            
-            if match_score >= 62:  # Allow for some discrepancy
-                white_moves.append((move, match_score))
-                
-        # Try to find moves for black
-        black_moves = []
-        for move in black_board.legal_moves:
-            temp_board = chess.Board(black_board.fen())
-            temp_board.push(move)
-            temp_array = self.board_to_color_array(temp_board)
-            
-            # Calculate match score
-            match_score = np.sum(temp_array == new_color_array)
-            
-            if match_score >= 62:  # Allow for some discrepancy
-                black_moves.append((move, match_score))
+        current_array = self.board_to_color_array(self.board)
+        other_side = self.board.copy(stack=False)
+        other_side.push(chess.Move.null())
+        boards = {self.board.turn: self.board, other_side.turn: other_side}
+        
+        # Moves matching at least 62/64 squares, allowing for some discrepancy
+        white_moves = md.match_moves(boards[chess.WHITE], current_array, new_color_array, max_mismatches=2)
+        black_moves = md.match_moves(boards[chess.BLACK], current_array, new_color_array, max_mismatches=2)
         
         # Determine which side has better moves
         best_white_score = max([score for _, score in white_moves], default=0)
@@ -279,24 +415,260 @@ class game:
         """
         # First, check if there's actually a change
         if np.array_equal(self.previous_board_array, new_color_array):
-            print("No board change detected")
+            log.debug("No board change detected")
             return None
         
         # Infer whose turn it is
         inferred_turn = self.infer_turn(self.previous_board_array, new_color_array)
         
         if inferred_turn is None:
-            print("Couldn't infer which side moved")
+            log.info("Couldn't infer which side moved")
             return None
             
-        print(f"Inferred turn: {'White' if inferred_turn == chess.WHITE else 'Black'}")
+        log.debug("Inferred turn: %s", "White" if inferred_turn == chess.WHITE else "Black")
         
         # Update the board with the inferred turn
         return self.update_board(new_color_array, forced_turn=inferred_turn)
     
+    def _append_movetext(self, san):
+        """Add the ply just pushed on self.board to the PGN movetext"""
+        white_moved = self.board.turn == chess.BLACK
+        number = self.board.fullmove_number if white_moved else self.board.fullmove_number - 1
+        self.movetext.append((number, white_moved, san))
+
     def get_pgn(self):
-        """Return the current game in PGN format"""
-        return str(self.game)
+        """
+        Return the current game in PGN format
+
+        Built from the incrementally kept movetext, so the cost does not depend on
+        replaying the whole game tree. Null moves played by pass_turn are left out.
+        """
+        headers = "\n".join(f'[{key} "{value}"]' for key, value in self.game.headers.items())
+        tokens = []
+        previous = None  # Move number of the White move just written
+        for number, white_moved, san in self.movetext:
+            if san == "--":
+                continue
+            if white_moved:
+                tokens.append(f"{number}. {san}")
+            elif previous != number:
+                # Black move not directly after White's, e.g. the first move or after a pass
+                tokens.append(f"{number}... {san}")
+            else:
+                tokens.append(san)
+            previous = number if white_moved else None
+        movetext = " ".join(tokens + [self.game.headers.get("Result", "*")])
+        return f"{headers}\n\n{movetext}"
+
+    def rank_moves(self, square_probs, k=3):
+        """
+        Rank legal moves by log-likelihood of a confidence-weighted board reading
+
+        Args:
+            square_probs: 8x8x3 array of [p_empty, p_white, p_black] per square
+            k: Number of candidates to return
+
+        Returns:
+            list: Up to k (move, log_likelihood) tuples, best first
+        """
+        log_probs = md.log_probabilities(square_probs)
+        return md.rank_moves(self.board, self.board_to_color_array(self.board), log_probs, k=k)
+
+    def decode_move(self, square_probs, k=3, min_margin=2.0):
+        """
+        Decode the move from per-square class probabilities
+
+        The best candidate is only accepted if it beats both the runner-up and the
+        "nothing moved" hypothesis by min_margin (in log-likelihood). Otherwise the
+        squares the candidates disagree on are returned so they can be re-read, or the
+        best move's own squares when it only falls short of "nothing moved".
+
+        Args:
+            square_probs: 8x8x3 array of [p_empty, p_white, p_black] per square
+            k: Number of candidates to consider
+            min_margin: Log-likelihood margin needed to accept the best move
+
+        Returns:
+            tuple: (move or None, candidates, disputed squares as (row, col) tuples)
+        """
+        log_probs = md.log_probabilities(square_probs)
+        # Scored against the tracked position, like detect_move, not the last noisy reading
+        current_array = self.board_to_color_array(self.board)
+        candidates = md.rank_moves(self.board, current_array, log_probs, k=k)
+        if not candidates:
+            return None, candidates, []
+
+        best_score = candidates[0][1]
+        runner_up = candidates[1][1] if len(candidates) > 1 else -np.inf
+        no_move = md.board_log_likelihood(current_array, log_probs)
+
+        if best_score - max(runner_up, no_move) >= min_margin:
+            return candidates[0][0], candidates, []
+
+        # Only the candidates still in contention decide which squares to re-read
+        contenders = [c for c in candidates if best_score - c[1] < min_margin]
+        if len(contenders) == 1:
+            # Only "nothing moved" is close: re-read the squares the best move touches
+            touched = {(row, col) for row, col, _ in md.color_changes(self.board, candidates[0][0])}
+            return None, candidates, sorted(touched)
+        return None, candidates, md.disputed_squares(self.board, contenders)
+
+    def recapture_square_probabilities(self, image_input, squares, square_probs=None):
+        """
+        Re-read only the given squares from a new image using the last board warp
+
+        Args:
+            image_input: Image path or BGR image array taken with the same calibration
+            squares: (row, col) tuples to re-read
+            square_probs: Probabilities to update, defaults to the last analysed reading
+
+        Returns:
+            np.ndarray: Copy of square_probs with the re-read squares replaced
+        """
+        if self.warp_matrix is None:
+            raise RuntimeError("No board warp available, analyze a full board first")
+
+        img = cv2.imread(image_input) if isinstance(image_input, str) else image_input
+        if img is None:
+            raise ValueError(f"Could not read image at {image_input}")
+
+        if square_probs is None:
+            square_probs = self.square_probabilities
+        updated = np.array(square_probs, dtype=np.float64, copy=True)
+
+        width, height = self.warp_size
+        if self.illumination is not None:
+            # Same lighting correction as the reading being re-checked
+            img = self.illumination.apply(img, self.warp_matrix, self.warp_size)
+        for row, col in squares:
+            x1, y1, x2, y2 = self._square_bounds(row, col, width, height)
+            # Shift the board warp so that this square lands at the origin
+            shift = np.array([[1, 0, -x1], [0, 1, -y1], [0, 0, 1]], dtype=np.float64)
+            square = cv2.warpPerspective(img, shift @ self.warp_matrix, (x2 - x1, y2 - y1))
+            updated[row, col] = sp.detect_chess_piece_probabilities(square)
+
+        return updated
+
+    def colour_lut(self):
+        """
+        The colour LUT for the current thresholds, or None when segmenting with HSV
+
+        The table is cached per threshold set, so it is only rebuilt after the ranges change.
+        """
+        if self.colour_lut_bins is None:
+            return None
+        return get_colour_lut(FrameContext.COLOUR_RANGES, bins=self.colour_lut_bins)
+
+    def camera_sampler(self, corners, matrix, size, image_shape):
+        """
+        The SquareSampler for the current board warp
+
+        Regions are only rebuilt when a corner moves by more than sampler_tolerance
+        pixels or the piece height changes, so detection jitter does not cost a rebuild
+        every frame.
+        """
+        sampler = self.square_sampler
+        height = self.piece_height * size[0] / 8
+        if sampler is None or sampler.size != tuple(size) or not sampler.matches(
+                corners, image_shape, self.sampler_tolerance, height, self.camera_focal_length):
+            sampler = SquareSampler(corners, matrix, size, image_shape, self._square_bounds,
+                                    height=height, focal_length=self.camera_focal_length)
+            self.square_sampler = sampler
+            log.debug("Rebuilt camera-space square regions for %s", sampler.window)
+        return sampler
+
+    def depth_heights(self, depth, corners, matrix, size):
+        """
+        Per-square heights above the board from an aligned depth frame
+
+        The sampling table is rebuilt like camera_sampler's regions, on the same piece-top
+        plane. The board plane is fitted on the squares the tracked position has empty,
+        the first time depth is seen for a warp or after reset_depth_plane.
+
+        Returns:
+            np.ndarray: 8x8 heights in mm (NaN without depth), or None if the plane could not be fitted
+        """
+        occupancy = self.depth_occupancy
+        height = self.piece_height * size[0] / 8
+        if occupancy is None or occupancy.size != tuple(size) or not occupancy.matches(
+                corners, depth.shape, self.sampler_tolerance, height, self.camera_focal_length):
+            occupancy = DepthOccupancy(corners, matrix, size, depth.shape, step=self.depth_step,
+                                       height=height, focal_length=self.camera_focal_length)
+            self.depth_occupancy = occupancy
+        if occupancy.plane_depth is None and not occupancy.fit_plane(depth, self.previous_board_array == 0):
+            log.warning("Not enough depth on empty squares to fit the board plane")
+            return None
+        return occupancy.heights(depth)
+
+    def reset_depth_plane(self):
+        """Refit the board plane on the next depth frame, e.g. after the board was recalibrated"""
+        if self.depth_occupancy is not None:
+            self.depth_occupancy.plane_depth = None
+
+    @staticmethod
+    def board_warp(corners):
+        """
+        Perspective transform that maps the board corners to an upright board image
+
+        Args:
+            corners: Four (x, y) board corners in any order
+
+        Returns:
+            tuple: (ordered corners [TL, TR, BR, BL], 3x3 matrix, (width, height))
+
+        Raises:
+            ValueError: If any corner is missing
+        """
+        # Order the points [top-left, top-right, bottom-right, bottom-left]
+        pts = np.array(corners, dtype=np.float32).reshape(-1, 2)
+        s = pts.sum(axis=1)
+        ordered_pts = np.zeros((4, 2), dtype=np.float32)
+        ordered_pts[0] = pts[np.argmin(s)]  # Top-left
+        ordered_pts[2] = pts[np.argmax(s)]  # Bottom-right
+        diff = np.diff(pts, axis=1)
+        ordered_pts[1] = pts[np.argmin(diff)]  # Top-right
+        ordered_pts[3] = pts[np.argmax(diff)]  # Bottom-left
+
+        if None in ordered_pts or any(np.isnan(pt).any() for pt in ordered_pts):
+            raise ValueError("Corner detection failed — one or more points are missing or invalid.")
+
+        # Get width and height of the chessboard
+        width = int(max(
+            np.linalg.norm(ordered_pts[0] - ordered_pts[1]),
+            np.linalg.norm(ordered_pts[2] - ordered_pts[3])
+        ))
+        height = int(max(
+            np.linalg.norm(ordered_pts[0] - ordered_pts[3]),
+            np.linalg.norm(ordered_pts[1] - ordered_pts[2])
+        ))
+
+        # Define the destination points for perspective transform
+        dst = np.array([
+            [0, 0],
+            [width - 1, 0],
+            [width - 1, height - 1],
+            [0, height - 1]
+        ], dtype=np.float32)
+
+        # Calculate the perspective transform matrix
+        matrix = cv2.getPerspectiveTransform(ordered_pts, dst)
+        return ordered_pts, matrix, (width, height)
+
+    @staticmethod
+    def _square_bounds(row, col, width, height):
+        """Padded pixel bounds (x1, y1, x2, y2) of a square in the warped board image"""
+        square_width = width // 8
+        square_height = height // 8
+
+        # Padding to zoom out (10% of square size)
+        padding_x = square_width // 10
+        padding_y = square_height // 10
+
+        x1 = max(col * square_width - padding_x, 0)
+        y1 = max(row * square_height - padding_y, 0)
+        x2 = min((col + 1) * square_width + padding_x, width)
+        y2 = min((row + 1) * square_height + padding_y, height)
+        return x1, y1, x2, y2
 
     def analyze_binary_board_state(analyzer, new_board_array):
         """
@@ -327,28 +699,22 @@ class game:
             else:
                 detected_move_san = detected_move_pgn  # fallback
         
-        # Create a visual representation of the board
-        board_visual = str(analyzer.board)
-        
-        # Prepare results
+        # The PGN comes from the incrementally kept movetext, no game tree replay per move
         results = {
             "detected_move": detected_move_san,
             "current_fen": analyzer.board.fen(),
             "board_array": analyzer.previous_board_array.copy(),
-            "board_visual": board_visual,
-            "pgn": analyzer.get_pgn()
+            "board_visual": str(analyzer.board),
+            "pgn": analyzer.get_pgn(),
         }
         
         # Print analysis summary
-        print(f"Detected move: {detected_move_san if detected_move_san else 'None'}")
-        #print(f"Current FEN: {analyzer.board.fen()}")
-        print(f"Current board state:")
-        print(board_visual)
+        log.info("Detected move: %s", detected_move_san)
         
         return results
     #######chessboard analyser methods ###############################
 
-    def analyze_chessboard(self, image_input, auto_calib=True, corners=[], DEBUG=False):
+    def analyze_chessboard(self, image_input, auto_calib=True, corners=[], DEBUG=False, depth=None):
         """
         Analyze a chessboard image and return a 2D array representing the board state.
 
@@ -357,6 +723,8 @@ class game:
             auto_calib (bool): Whether to auto-calibrate corners
             corners (list): Optional known corners
             DEBUG (bool): Show debug image
+            depth (np.ndarray): Optional depth frame in mm aligned to the image, fused
+                                with colour for occupancy (see fuse_depth)
 
         Returns:
             np.ndarray: 8x8 board array, list: used corners
@@ -373,40 +741,45 @@ class game:
             raise TypeError("image_input must be a file path (str) or a NumPy image")
         
             #cv2.imshow("Original Chessboard Image", img)  # Display the image in a window
+        laps = timing.laps()
+
+        # Compute HSV and colour masks once here and share them with every stage. When the
+        # lighting is being corrected the board gets its own corrected frame after the
+        # corners are found, so only the uncorrected frame's markers are segmented here
+        frame = FrameContext(img, lut=self.colour_lut())
+        normalise = self.illumination is not None and self.illumination.active
+        # Convert up front so the cost is timed as its own stage; camera-space sampling
+        # only segments the board window and the classifier converts its own crops, so
+        # both skip the full-frame conversion
+        if ((self.square_sampling != "camera" and self.piece_classifier is None) or DEBUG) and not normalise:
+            if frame.lut is not None:
+                frame.labels
+            else:
+                frame.hsv
+        laps.mark("vision.convert")
+
         # Initialize approx
         approx = None
         #print(f"[DEBUG] Type of current_img: {type(img)}")
 
-        if auto_calib == True:
-            #print(f"[DEBUG] attempting to detect corners")
-            approx, success = self.detect_blue_corners(img)
-            if not success:
-                #print(f"[DEBUG] corner detection failed, manually select corners")
-                approx = select_points(image_input)
-        elif corners is not None and len(corners) > 0:
+        if corners is not None and len(corners) > 0 and not auto_calib:
             approx = corners
         else:
-            approx = select_points(image_input)
-
-
-        # Order the points [top-left, top-right, bottom-right, bottom-left]
-        pts = np.array(approx, dtype=np.float32).reshape(-1, 2)
-        s = pts.sum(axis=1)
-        ordered_pts = np.zeros((4, 2), dtype=np.float32)
-        ordered_pts[0] = pts[np.argmin(s)]  # Top-left
-        ordered_pts[2] = pts[np.argmax(s)]  # Bottom-right
-        diff = np.diff(pts, axis=1)
-        ordered_pts[1] = pts[np.argmin(diff)]  # Top-right
-        ordered_pts[3] = pts[np.argmax(diff)]  # Bottom-left
-
-
-        if None in ordered_pts or any(np.isnan(pt).any() for pt in ordered_pts):
-            raise ValueError("Corner detection failed — one or more points are missing or invalid.")
-
-        # Create a copy of the original image to draw points on
-        img_with_points = img.copy()
-
-        # Draw the corner points on the original image
+            # Never block on the click UI here, fall back through resolve_corners instead
+            approx, source = self.resolve_corners(frame)
+            log.debug("Board corners from %s", source)
+            if approx is None:
+                log.warning("No board corners available, skipping this frame")
+                return self.previous_board_array.copy(), None
+        laps.mark("vision.corners")
+
+        ordered_pts, matrix, (width, height) = self.board_warp(approx)
+        if normalise:
+            # Gains learnt from previous frames, applied to the board area only
+            frame = FrameContext(self.illumination.apply(img, matrix, (width, height)), lut=self.colour_lut())
+            laps.mark("vision.illumination")
+
+        # Colour labels (point markers) for [top-left, top-right, bottom-right, bottom-left]
         colors = [(0, 0, 255),   # Red for top-left
                 (0, 255, 0),   # Green for top-right
                 (255, 0, 0),   # Blue for bottom-right
@@ -414,128 +787,100 @@ class game:
 
         point_labels = ["TL", "TR", "BR", "BL"]
 
-        for i, point in enumerate(ordered_pts):
-            x, y = int(point[0]), int(point[1])
-            cv2.circle(img_with_points, (x, y), 10, colors[i], -1)
-            cv2.putText(img_with_points, point_labels[i], (x+10, y+10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, colors[i], 2)
-
-        # Display the original image with corner points
-        cv2.imshow("Original with Corners", img_with_points)
-
-        # Get width and height of the chessboard
-        width = int(max(
-            np.linalg.norm(ordered_pts[0] - ordered_pts[1]),
-            np.linalg.norm(ordered_pts[2] - ordered_pts[3])
-        ))
-        height = int(max(
-            np.linalg.norm(ordered_pts[0] - ordered_pts[3]),
-            np.linalg.norm(ordered_pts[1] - ordered_pts[2])
-        ))
-
-        # Define the destination points for perspective transform
-        dst = np.array([
-            [0, 0],
-            [width - 1, 0],
-            [width - 1, height - 1],
-            [0, height - 1]
-        ], dtype=np.float32)
-
-        # Calculate the perspective transform matrix and apply it
-        matrix = cv2.getPerspectiveTransform(ordered_pts, dst)
-        warped = cv2.warpPerspective(img, matrix, (width, height))
-
-        # Create a copy of the warped image to draw points on
-        warped_with_points = warped.copy()
-
-        # Draw the corner points on the warped image
-        # Since we know exactly where these points should be after transformation
-        warped_corners = [
-            (0, 0),                  # Top-left
-            (width - 1, 0),          # Top-right
-            (width - 1, height - 1), # Bottom-right
-            (0, height - 1)          # Bottom-left
-        ]
-
-        for i, point in enumerate(warped_corners):
-            x, y = point
-            cv2.circle(warped_with_points, (x, y), 10, colors[i], -1)
-            cv2.putText(warped_with_points, point_labels[i], (x+10, y+10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, colors[i], 2)
-
-        # Display the warped chessboard with corner points
-        #cv2.imshow("Corrected Chessboard with Corners", warped_with_points)
-        # Step 2: Divide the chessboard into 64 squares
-        square_width = width // 8
-        square_height = height // 8
+        if DEBUG:
+            # Create a copy of the original image to draw points on
+            img_with_points = img.copy()
+            for i, point in enumerate(ordered_pts):
+                x, y = int(point[0]), int(point[1])
+                cv2.circle(img_with_points, (x, y), 10, colors[i], -1)
+                cv2.putText(img_with_points, point_labels[i], (x+10, y+10), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 1, colors[i], 2)
+
+            # Display the original image with corner points
+            cv2.imshow("Original with Corners", img_with_points)
+
+        sampler = self.camera_sampler(ordered_pts, matrix, (width, height), img.shape) \
+            if self.square_sampling == "camera" and self.piece_classifier is None and not DEBUG else None
+        if self.piece_classifier is not None:
+            # All 64 squares resampled from the camera frame and classified in one batch
+            board, square_probs = self.piece_classifier.classify_board(frame.bgr, matrix, (width, height),
+                                                                       self._square_bounds)
+            if DEBUG:
+                log.info("Squares read by the piece classifier, no per-square colour plots")
+        elif sampler is not None:
+            # Count colours in precomputed camera-space square regions, no warp or crops
+            board, square_probs = sampler.classify(frame)
+        else:
+            # Warp the colour masks only, the BGR board image is just needed for the debug plots
+            planes = frame.warp_piece_masks(matrix, (width, height))
+            laps.mark("vision.warp")
+
+            if DEBUG:
+                # matplotlib is slow to import and only needed for these debug plots
+                import matplotlib.pyplot as plt
+                warped = cv2.warpPerspective(frame.bgr, matrix, (width, height))
+                fig, axes = plt.subplots(8, 8, figsize=(15, 15))
         
-        # Create a figure to display all squares
-        
-        fig, axes = plt.subplots(8, 8, figsize=(15, 15))
-        if not DEBUG:
-            plt.close(fig)
-        
-        # Initialize the board representation
-        board = np.zeros((8, 8), dtype=np.int8)
-        
-        # Process each square
-        square_images = []
-        for row in range(8):
-            for col in range(8):
-                # Extract square
-                """
-                y1 = row * square_height
-                y2 = (row + 1) * square_height
-                x1 = col * square_width
-                x2 = (col + 1) * square_width
-                
-                square = warped[y1:y2, x1:x2].copy()
-                """
-            # Define base square boundaries
-                base_x1 = col * square_width
-                base_y1 = row * square_height
-                base_x2 = (col + 1) * square_width
-                base_y2 = (row + 1) * square_height
-
-                # Padding to zoom out (e.g. 25% of square size)
-                padding_x = square_width // 10
-                padding_y = square_height // 10
-
-                # Expand the boundaries
-                x1 = max(base_x1 - padding_x, 0)
-                y1 = max(base_y1 - padding_y, 0)
-                x2 = min(base_x2 + padding_x, warped.shape[1])
-                y2 = min(base_y2 + padding_y, warped.shape[0])
-
-                # Extract expanded square region
-                square = warped[y1:y2, x1:x2].copy()
-
-
-                square_images.append(square)
-                
-                # Detect if there's a piece and its color
-                #is_piece, piece_color = detect_piece_and_color(square)
-                is_piece, piece_color, z = sp.detect_chess_piece_colour(square)
+            # Initialize the board representation
+            board = np.zeros((8, 8), dtype=np.int8)
+            square_probs = np.zeros((8, 8, 3), dtype=np.float64)
+        
+            # Process each square
+            for row in range(8):
+                for col in range(8):
+                    # Square boundaries, padded by 10% to zoom out
+                    x1, y1, x2, y2 = self._square_bounds(row, col, width, height)
+                    square_planes = planes[y1:y2, x1:x2]
                 
+                    # Detect if there's a piece and its color
+                    is_piece, piece_color, square_probs[row, col] = sp.classify_colour_masks(
+                        square_planes[..., 0], square_planes[..., 1])
                 
-                # Update the board array
-                if is_piece:
-                    if piece_color == "white":
-                        board[row, col] = 1
-                    else:  # piece_color == "black"
-                        board[row, col] = -1
+                    # Update the board array
+                    if is_piece:
+                        if piece_color == "white":
+                            board[row, col] = 1
+                        else:  # piece_color == "black"
+                            board[row, col] = -1
                 
-                # Display the square with its classification
-                square_rgb = cv2.cvtColor(square, cv2.COLOR_BGR2RGB)
-                axes[row, col].imshow(square_rgb)
-                axes[row, col].set_title(f"{'Empty' if not is_piece else piece_color}", fontsize=8)
-                axes[row, col].axis('off')
+                    if DEBUG:
+                        # Display the square with its classification
+                        square_rgb = cv2.cvtColor(warped[y1:y2, x1:x2], cv2.COLOR_BGR2RGB)
+                        axes[row, col].imshow(square_rgb)
+                        axes[row, col].set_title(f"{'Empty' if not is_piece else piece_color}", fontsize=8)
+                        axes[row, col].axis('off')
         
         #plt.tight_layout()
         #plt.show()
+        laps.mark("vision.classify")
+
+        if depth is not None and depth.shape[:2] != img.shape[:2]:
+            log.warning("Depth frame %s is not aligned to the %s colour frame, ignoring it",
+                        depth.shape[:2], img.shape[:2])
+        elif depth is not None:
+            heights = self.depth_heights(depth, ordered_pts, matrix, (width, height))
+            if heights is not None:
+                # Colour cannot tell which side a piece it missed belongs to: keep the side that
+                # was there, and on a newly occupied square assume the side that just moved
+                mover = 1 if self.board.turn == chess.WHITE else -1
+                fallback = np.where(self.previous_board_array != 0, self.previous_board_array, mover)
+                board, square_probs = fuse_depth(board, square_probs, heights, fallback, self.depth_threshold)
+                self.square_heights = heights
+            laps.mark("vision.depth")
+
+        self.square_probabilities = square_probs
+        self.warp_matrix = matrix
+        self.warp_size = (width, height)
+
+        if self.illumination is not None:
+            # Squares empty both before and in this reading are safe lighting references
+            empty = (board == 0) & (self.previous_board_array == 0)
+            self.illumination.update(img, matrix, (width, height), empty)
+        laps.total("vision.analyze_chessboard")
         
         # Display the final board state
         if DEBUG:
+            import matplotlib.pyplot as plt
             fig, ax = plt.subplots(figsize=(10, 10))
             cmap = plt.cm.colors.ListedColormap(['darkgrey','white', 'lightgrey', ])
             bounds = [-1.5, -0.5, 0.5, 1.5]
@@ -571,6 +916,147 @@ class game:
         
         return board, approx
     
+    def resolve_corners(self, frame):
+        """
+        Board corners for one frame without ever blocking the game loop
+
+        Tries, in order: the blue markers in this frame, the last known good corners,
+        markers seen separately over the last temporal_frames frames, and the board's
+        own square grid. When all of these fail for more than temporal_frames frames
+        in a row, operator_request is called once and the frame is skipped.
+
+        The last good corners are only reused while every marker visible in this frame
+        is still within corner_tolerance of them, and for at most temporal_frames frames
+        in a row, so a board moved while a marker is covered is noticed.
+
+        Args:
+            frame (FrameContext): Current frame
+
+        Returns:
+            tuple: (corners TL, TR, BL, BR or None, source name)
+        """
+        self.corner_frame += 1
+        found, success = self.detect_blue_corners(frame)
+        for index, point in enumerate(found):
+            if not np.isnan(point[0]) and not np.isnan(point[1]):
+                self.corner_sightings[index] = (self.corner_frame, point)
+
+        if success:
+            self.set_good_corners(found)
+            return found, "markers"
+        self.corner_failures += 1
+
+        if self.last_good_corners is not None:
+            moved = [index for index, point in enumerate(found)
+                     if not np.isnan(point[0]) and not np.isnan(point[1])
+                     and np.hypot(point[0] - self.last_good_corners[index][0],
+                                  point[1] - self.last_good_corners[index][1]) > self.corner_tolerance]
+            if moved:
+                log.warning("Markers %s moved away from the last good corners, discarding them", moved)
+                self.last_good_corners = None
+                # Sightings from before the move would mix two board positions
+                self.corner_sightings = [sighting if sighting is not None and sighting[0] == self.corner_frame
+                                         else None for sighting in self.corner_sightings]
+            elif self.corner_failures <= self.temporal_frames:
+                return self.last_good_corners, "last_good"
+
+        # Markers occluded at different times can still add up to a full set
+        recent = [sighting for sighting in self.corner_sightings
+                  if sighting is not None and self.corner_frame - sighting[0] < self.temporal_frames]
+        if len(recent) == 4:
+            corners = [point for _, point in recent]
+            self.set_good_corners(corners)
+            return corners, "temporal"
+
+        corners, success = self.detect_grid_corners(frame)
+        if success:
+            self.set_good_corners(corners)
+            return corners, "grid"
+
+        if self.corner_failures > self.temporal_frames and not self.operator_requested:
+            self.operator_requested = True
+            log.warning("Board corners not found for %d frames, requesting them from the operator",
+                        self.corner_failures)
+            if self.operator_request is not None:
+                self.operator_request()
+        return None, "none"
+
+    def analyze_calibrated(self, img, corners, depth=None):
+        """
+        Read the board from a move frame, reusing calibrated corners where possible
+
+        The calibrated corners are used as they are while the blue markers are still on
+        them, so no corner detection runs. Only when that check fails are the corners
+        found again through resolve_corners.
+
+        Args:
+            img (np.ndarray): BGR camera frame
+            corners (list): Calibrated corners (TL, TR, BL, BR), or None/empty if not calibrated yet
+            depth (np.ndarray): Optional aligned depth frame in mm
+
+        Returns:
+            tuple: (8x8 board array, corners used or None, True if they are freshly detected
+                   marker corners that should replace the calibration)
+        """
+        if corners is not None and len(corners) > 0 and board_calibration.markers_present(img, corners):
+            board_array, used = self.analyze_chessboard(img, auto_calib=False, corners=corners, depth=depth)
+            return board_array, used, False
+
+        log.info("Blue markers not on the calibrated corners, detecting them again")
+        board_array, used = self.analyze_chessboard(img, auto_calib=True, depth=depth)
+        fresh = used is not None and board_calibration.markers_present(img, used)
+        return board_array, used, fresh
+
+    def set_good_corners(self, corners):
+        """Record corners known to be right, they become the last known good fallback"""
+        self.last_good_corners = [tuple(point) for point in corners]
+        self.corner_failures = 0
+        self.operator_requested = False
+
+    def set_operator_corners(self, corners):
+        """Corners supplied by an operator in answer to operator_request (TL, TR, BL, BR)"""
+        log.info("Using operator supplied corners %s", corners)
+        self.set_good_corners(corners)
+
+    def detect_grid_corners(self, frame, max_width=640):
+        """
+        Find the board corners from its 7x7 inner square corners, without the blue markers
+
+        Only works while enough of the grid is visible, so it is a fallback rather than
+        the main detector. The search runs on a downscaled grey image.
+
+        Args:
+            frame (FrameContext): Current frame
+            max_width (int): Width the image is reduced to for the search
+
+        Returns:
+            tuple: (corners TL, TR, BL, BR, success)
+        """
+        gray = cv2.cvtColor(frame.bgr, cv2.COLOR_BGR2GRAY)
+        scale = min(1.0, max_width / gray.shape[1])
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        flags = cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_NORMALIZE_IMAGE | cv2.CALIB_CB_FAST_CHECK
+        found, inner = cv2.findChessboardCorners(gray, (7, 7), flags=flags)
+        if not found:
+            return [(np.nan, np.nan)] * 4, False
+
+        # Inner corners sit at whole square coordinates 1..7, extrapolate to 0 and 8
+        grid = np.array([(col, row) for row in range(1, 8) for col in range(1, 8)], dtype=np.float32)
+        matrix, _ = cv2.findHomography(grid, inner.reshape(-1, 2) / scale)
+        if matrix is None:
+            return [(np.nan, np.nan)] * 4, False
+        outer = cv2.perspectiveTransform(np.array([[[0, 0], [8, 0], [0, 8], [8, 8]]], dtype=np.float32),
+                                         matrix).reshape(4, 2)
+
+        # The grid has no orientation, so order the corners by image position
+        sums, diffs = outer.sum(axis=1), outer[:, 1] - outer[:, 0]
+        order = [np.argmin(sums), np.argmin(diffs), np.argmax(diffs), np.argmax(sums)]
+        if len(set(order)) < 4:
+            return [(np.nan, np.nan)] * 4, False
+        return [tuple(float(v) for v in outer[i]) for i in order], True
+
     """
     def detect_blue_corners(self, image_input, show_result=False):
         print(f"[DEBUG] detect_blue_corners received type: {type(image_input)}")
@@ -675,96 +1161,60 @@ class game:
         return ordered_points, success
 
     """
-    def detect_blue_corners(self, image_input, show_result=False):
-        #print(f"[DEBUG] detect_blue_corners received type: {type(image_input)}")
+    def detect_blue_corners(self, image_input, show_result=False, min_area=4, pyramid_level=None):
+        """
+        Find the blue corner markers as the blue blobs closest to each image corner
 
-        if isinstance(image_input, str):
+        The markers are first searched for on the frame shrunk by 2**pyramid_level and
+        then refined in a small full-resolution window each, so the full frame is only
+        thresholded when the coarse search fails (or its blue mask already exists).
+        By default the coarsest level that still resolves all four markers is used,
+        starting from marker_pyramid_level and remembering any lower level that worked.
+
+        Args:
+            image_input (FrameContext, str or np.ndarray): Frame, image path or BGR image
+            show_result (bool): Draw the found corners onto the image
+            min_area (int): Smallest blob in pixels (at full resolution) accepted as a marker
+            pyramid_level (int): Fixed downscale level of the coarse search, 0 searches at full
+                                 resolution, None adapts it
+
+        Returns:
+            tuple: ([TL, TR, BL, BR] as (x, y), NaN where missing, success)
+        """
+        if isinstance(image_input, FrameContext):
+            frame = image_input
+        elif isinstance(image_input, str):
             img = cv2.imread(image_input)
             if img is None:
                 raise ValueError(f"Could not read image at {image_input}")
+            frame = FrameContext(img)
         elif isinstance(image_input, np.ndarray):
-            img = image_input
+            frame = FrameContext(image_input)
         else:
-            raise TypeError("image_input must be a file path (str) or a NumPy image")
-        
-        # Fix: Use img.shape instead of image_input.shape
-        h, w = img.shape[:2]
-        
-        # Convert to HSV
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-
-        # HSV range for blue
-        lower_blue = np.array([0, 199, 70])
-        upper_blue = np.array([133, 255, 255])
-        mask = cv2.inRange(hsv, lower_blue, upper_blue)
-
-        # Find contours
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        # Fix: Use correct image corner coordinates (0-indexed)
-        image_corners = {
-            "TL": (0, 0),
-            "TR": (w-1, 0),
-            "BL": (0, h-1),
-            "BR": (w-1, h-1)
-        }
-        #max_distance = min(w, h) * 0.75  # Threshold: 35% of size (increased for better detection)
-        max_distance = 800
-        
-
-        centroids = []
-        for cnt in contours:
-            M = cv2.moments(cnt)
-            if M['m00'] == 0:
-                continue
-            cx = int(M['m10'] / M['m00'])
-            cy = int(M['m01'] / M['m00'])
-            point = (cx, cy)
-            centroids.append(point)
-            #cv2.circle(img, point, 5, (255, 0, 255), 2)  # magenta
-
-        #print(f"[DEBUG] Found {len(centroids)} centroids: {centroids}")
-        #print(f"[DEBUG] Image corners: {image_corners}")
-        #print(f"[DEBUG] Max distance threshold: {max_distance}")
-
-        # Match best centroid to each corner (closest only)
-        best_matches = {label: (None, float('inf')) for label in image_corners}
-
-        for point in centroids:
-            for label, corner in image_corners.items():
-                dist = np.linalg.norm(np.array(point) - np.array(corner))
-                #print(f"[DEBUG] Distance from {point} to {label} {corner}: {dist}")
-                if dist < max_distance and dist < best_matches[label][1]:
-                    best_matches[label] = (point, dist)
-                    #print(f"[DEBUG] New best match for {label}: {point} (dist: {dist})")
-
-        found_corners = {
-            label: pt for label, (pt, dist) in best_matches.items() if pt is not None
-        }
-
-        #print(f"[DEBUG] Found corners: {found_corners}")
-
-        # Ensure all 4 corners were found
-        ordered_labels = ["TL", "TR", "BL", "BR"]
-        ordered_points = []
-
-        for lbl in ordered_labels:
-            pt = found_corners.get(lbl)
-            if pt is None:
-                ordered_points.append((np.nan, np.nan))
-            else:
-                ordered_points.append(pt)
-
-        success = all(
-            isinstance(pt, (list, tuple)) and
-            len(pt) == 2 and
-            not np.isnan(pt[0]) and
-            not np.isnan(pt[1])
-            for pt in ordered_points
-        )
-
-        #print(f"[DEBUG] Success: {success}")
-        #print(f"[DEBUG] Ordered points: {ordered_points}")
+            raise TypeError("image_input must be a file path (str), a NumPy image or a FrameContext")
+        img = frame.bgr
+
+        ordered_points = None
+        if not frame.has_mask("blue"):
+            levels = [pyramid_level] if pyramid_level is not None else range(self.marker_pyramid_level, 0, -1)
+            for level in levels:
+                if level <= 0:
+                    break
+                ordered_points = self._coarse_to_fine_corners(frame, level, min_area)
+                if ordered_points is not None:
+                    if pyramid_level is None:
+                        # Small markers vanish at coarse levels, stay at the level that resolved them
+                        self.marker_pyramid_level = level
+                    break
+
+        if ordered_points is None:
+            # Blue marker mask, shared with the rest of the frame's analysis
+            found, _ = self._nearest_blobs(frame.mask("blue"), min_area, max_distance=800)
+            ordered_points = [(np.nan, np.nan) if point is None else point for point in found]
+
+        success = not np.isnan(np.array(ordered_points)).any()
+
+        log.debug("Corner detection success: %s, ordered points: %s", success, ordered_points)
 
         if show_result:
             # Fix: Only draw circles for valid points
@@ -780,6 +1230,75 @@ class game:
 
         return ordered_points, success
 
+    @staticmethod
+    def _nearest_blobs(mask, min_area, max_distance):
+        """
+        Closest blob to each image corner of a binary mask
+
+        A blob nearest to several image corners only counts for the closest of them,
+        so a covered marker is reported missing instead of duplicating a neighbour.
+
+        Returns:
+            tuple: ([TL, TR, BL, BR] centroids or None, matching blob areas)
+        """
+        h, w = mask.shape[:2]
+        # Label every blob with its area and centroid in one pass
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        # Drop the background label and specks too small to be a marker
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        keep = areas >= min_area
+        centroids, areas = centroids[1:][keep], areas[keep]
+        log.debug("Found %d blue blobs (%d above %d px)", count - 1, len(centroids), min_area)
+
+        # Image corners in TL, TR, BL, BR order (0-indexed)
+        image_corners = np.array([[0, 0], [w - 1, 0], [0, h - 1], [w - 1, h - 1]], dtype=np.float64)
+
+        # Closest blob to each image corner, from a blobs x corners distance matrix
+        points, sizes = [None] * 4, [0] * 4
+        if len(centroids):
+            distances = np.linalg.norm(centroids[:, None, :] - image_corners[None, :, :], axis=-1)
+            nearest = distances.argmin(axis=0)
+            for corner, blob in enumerate(nearest):
+                claims = np.flatnonzero(nearest == blob)
+                if corner != claims[distances[blob, claims].argmin()]:
+                    continue
+                if distances[blob, corner] < max_distance:
+                    points[corner] = (float(centroids[blob, 0]), float(centroids[blob, 1]))
+                    sizes[corner] = int(areas[blob])
+        return points, sizes
+
+    def _coarse_to_fine_corners(self, frame, level, min_area):
+        """
+        Find the markers on a downscaled frame and refine each at full resolution
+
+        Returns:
+            list: [TL, TR, BL, BR] sub-pixel centroids, or None if any marker is missing
+                  or shared at the coarse level, or missing in its refinement window
+        """
+        scale = 1 << level
+        coarse, sizes = self._nearest_blobs(frame.downscaled(level).mask("blue"),
+                                            max(1, min_area // (scale * scale)), max_distance=800 / scale)
+        # A marker lost at this scale lets a neighbour's blob claim its corner too
+        if any(point is None for point in coarse) or len(set(coarse)) < 4:
+            return None
+
+        h, w = frame.shape[:2]
+        refined = []
+        for (x, y), area in zip(coarse, sizes):
+            # Window covering the coarse blob plus a margin for the downscaling error
+            radius = int(np.sqrt(area) * scale + 2 * scale) + 2
+            cx, cy = (x + 0.5) * scale - 0.5, (y + 0.5) * scale - 0.5
+            x1, y1 = max(int(cx) - radius, 0), max(int(cy) - radius, 0)
+            x2, y2 = min(int(cx) + radius + 1, w), min(int(cy) + radius + 1, h)
+            count, _, stats, centroids = cv2.connectedComponentsWithStats(
+                frame.crop_mask("blue", x1, y1, x2, y2), connectivity=8)
+            if count < 2:
+                return None
+            # Largest blob in the window is the marker; its pixel mean is a sub-pixel centroid
+            blob = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+            refined.append((float(x1 + centroids[blob, 0]), float(y1 + centroids[blob, 1])))
+        return refined
+
 def select_points(image_path, num_points=4, max_height=900, max_width=1600):
     """
     Opens an image and allows the user to select points by clicking.
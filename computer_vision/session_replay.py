@@ -0,0 +1,294 @@
+"""
+Record camera sessions from Chess_Core and replay them offline.
+
+A session is either a directory
+
+    frames/<stamp_ns>.png      camera frames
+    depth/<stamp_ns>.png       optional 16-bit depth (mm) aligned to the frame with the same stamp
+    move_complete.csv          "<stamp_ns>,<0|1>" per /move_complete message
+    moves.txt                  optional ground truth, one SAN move per line
+    settings.json              the node's vision settings (see analyzer_settings)
+
+or a single .npz file with the same content (frame_stamps, frames, move_stamps,
+move_data and optionally moves, depths, one depth frame per frame, and settings
+as a JSON string).
+
+Replay feeds, for every /move_complete event, the first frame received after it
+(what Chess_Core.check_move sees once it handles the event) through
+analyze_calibrated -> analyze_binary_board_state exactly like Chess_Core.check_move,
+with the settings the node recorded, headlessly and as fast as possible, and reports
+per-stage latency and move-detection accuracy.
+
+Usage:
+    python -m computer_vision.session_replay recordings/game1
+    python -m computer_vision.session_replay game1.npz --repeat 5
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import cv2
+import numpy as np
+from computer_vision import python_chess3 as chs
+from computer_vision import hsv_profile
+from computer_vision import timing
+from computer_vision import log_utils
+from computer_vision.illumination import IlluminationNormaliser
+from computer_vision.piece_classifier import PieceClassifier
+
+log = logging.getLogger(__name__)
+
+
+def analyzer_settings(analyzer, piece_model=""):
+    """
+    The vision settings of a running game analyzer, as recorded with a session
+
+    Args:
+        analyzer (python_chess3.game): The node's analyzer
+        piece_model (str): Path of the piece classifier it loaded, "" for none
+
+    Returns:
+        dict: JSON-ready settings for configured_analyzer
+    """
+    return {
+        "illumination": analyzer.illumination is not None,
+        "square_sampling": analyzer.square_sampling,
+        "piece_height": analyzer.piece_height,
+        "camera_focal_length": analyzer.camera_focal_length,
+        "piece_model": piece_model if analyzer.piece_classifier is not None else "",
+        "hsv_ranges": hsv_profile.encode_ranges(hsv_profile.current_ranges()),
+    }
+
+
+def configured_analyzer(settings=None):
+    """
+    A game analyzer set up like the node that recorded a session
+
+    The recorded HSV thresholds are applied to the live thresholds of this process.
+    A piece model that cannot be loaded here is logged and the colour thresholds are
+    used instead, like Chess_Core does.
+    """
+    analyzer = chs.game()
+    if not settings:
+        return analyzer
+    if settings.get("illumination"):
+        analyzer.illumination = IlluminationNormaliser()
+    analyzer.square_sampling = settings.get("square_sampling", analyzer.square_sampling)
+    analyzer.piece_height = settings.get("piece_height", analyzer.piece_height)
+    analyzer.camera_focal_length = settings.get("camera_focal_length")
+    if settings.get("hsv_ranges"):
+        hsv_profile.apply_ranges(hsv_profile.decode_ranges(settings["hsv_ranges"], "session settings"))
+    if settings.get("piece_model"):
+        try:
+            analyzer.piece_classifier = PieceClassifier.load(settings["piece_model"])
+        except (OSError, ValueError, KeyError) as e:
+            log.error("Could not load piece model %s, replaying with the colour thresholds: %s",
+                      settings["piece_model"], e)
+    return analyzer
+
+
+class Session:
+    """Frames and /move_complete events of one recorded game"""
+
+    def __init__(self, frame_stamps, frames, move_stamps, move_data, moves=None, depths=None, settings=None):
+        """
+        Args:
+            frame_stamps (list): Receive time of each frame in ns, ascending
+            frames (list): BGR frames, or paths loaded on first access
+            move_stamps (list): Receive time of each /move_complete message in ns
+            move_data (list): Bool payload of each /move_complete message
+            moves (list): Optional ground truth SAN per event
+            depths (list): Optional aligned depth frame (or path, or None) per frame
+            settings (dict): Optional vision settings of the recording node (see analyzer_settings)
+        """
+        self.frame_stamps = np.asarray(frame_stamps, dtype=np.int64)
+        self.frames = list(frames)
+        self.depths = list(depths) if depths is not None else [None] * len(self.frames)
+        self.move_stamps = np.asarray(move_stamps, dtype=np.int64)
+        self.move_data = [bool(d) for d in move_data]
+        self.moves = list(moves) if moves is not None else None
+        self.settings = settings
+
+    @classmethod
+    def load(cls, path):
+        """Load a session directory or .npz file"""
+        if os.path.isdir(path):
+            frame_dir = os.path.join(path, "frames")
+            names = sorted((f for f in os.listdir(frame_dir) if f.endswith(".png")),
+                           key=lambda f: int(os.path.splitext(f)[0]))
+            frame_stamps = [int(os.path.splitext(f)[0]) for f in names]
+            frames = [os.path.join(frame_dir, f) for f in names]
+            depth_paths = [os.path.join(path, "depth", f) for f in names]
+            depths = [p if os.path.exists(p) else None for p in depth_paths]
+
+            move_stamps, move_data = [], []
+            with open(os.path.join(path, "move_complete.csv")) as f:
+                for line in f:
+                    if line.strip():
+                        stamp, data = line.strip().split(",")
+                        move_stamps.append(int(stamp))
+                        move_data.append(int(data))
+
+            moves = None
+            moves_path = os.path.join(path, "moves.txt")
+            if os.path.exists(moves_path):
+                with open(moves_path) as f:
+                    moves = [line.strip() for line in f if line.strip()]
+            settings = None
+            settings_path = os.path.join(path, "settings.json")
+            if os.path.exists(settings_path):
+                with open(settings_path) as f:
+                    settings = json.load(f)
+            return cls(frame_stamps, frames, move_stamps, move_data, moves, depths, settings)
+
+        data = np.load(path, allow_pickle=False)
+        moves = list(data["moves"]) if "moves" in data else None
+        depths = list(data["depths"]) if "depths" in data else None
+        settings = json.loads(str(data["settings"])) if "settings" in data else None
+        return cls(data["frame_stamps"], list(data["frames"]), data["move_stamps"], data["move_data"], moves, depths,
+                   settings)
+
+    def frame(self, index):
+        frame = self.frames[index]
+        if isinstance(frame, str):
+            img = cv2.imread(frame)
+            if img is None:
+                raise ValueError(f"Could not read image at {frame}")
+            self.frames[index] = frame = img
+        return frame
+
+    def depth(self, index):
+        """Depth frame recorded with frame index, or None"""
+        depth = self.depths[index]
+        if isinstance(depth, str):
+            img = cv2.imread(depth, cv2.IMREAD_UNCHANGED)
+            if img is None:
+                raise ValueError(f"Could not read depth at {depth}")
+            self.depths[index] = depth = img
+        return depth
+
+    def frame_after(self, stamp):
+        """Index of the first frame received at or after stamp, or None"""
+        index = np.searchsorted(self.frame_stamps, stamp, side="left")
+        return int(index) if index < len(self.frame_stamps) else None
+
+
+class SessionRecorder:
+    """Writes a session directory while Chess_Core runs"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.join(path, "frames"), exist_ok=True)
+        self._events = open(os.path.join(path, "move_complete.csv"), "a")
+
+    def record_frame(self, img, stamp_ns=None, depth=None):
+        stamp_ns = time.time_ns() if stamp_ns is None else stamp_ns
+        cv2.imwrite(os.path.join(self.path, "frames", f"{stamp_ns}.png"), img)
+        if depth is not None:
+            os.makedirs(os.path.join(self.path, "depth"), exist_ok=True)
+            cv2.imwrite(os.path.join(self.path, "depth", f"{stamp_ns}.png"), depth)
+
+    def record_settings(self, settings):
+        """Write the node's vision settings (see analyzer_settings), replacing earlier ones"""
+        tmp_path = os.path.join(self.path, "settings.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(settings, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, "settings.json"))
+
+    def record_move_complete(self, data, stamp_ns=None):
+        stamp_ns = time.time_ns() if stamp_ns is None else stamp_ns
+        self._events.write(f"{stamp_ns},{int(bool(data))}\n")
+        self._events.flush()
+
+    def close(self):
+        self._events.close()
+
+
+def replay_session(session, use_depth=True):
+    """
+    Run the vision and move-detection pipeline over every event of a session
+
+    The analyzer is set up with the recorded settings (see configured_analyzer), and
+    recorded depth frames are fused with colour like Chess_Core does unless use_depth is False.
+
+    Returns:
+        dict: "latency_ms" {stage: list of ms}, "detected" SAN per event, "correct"/"total"
+              against the ground truth (None without ground truth)
+    """
+    analyzer = configured_analyzer(session.settings)
+    latency = {"analyze_calibrated": [], "analyze_binary_board_state": [], "total": []}
+    detected = []
+    corners = None
+
+    for stamp in session.move_stamps:
+        index = session.frame_after(stamp)
+        if index is None:
+            detected.append(None)
+            continue
+        img = session.frame(index)
+
+        # The same call Chess_Core.check_move makes, corners carried over like its calibration
+        start = time.perf_counter_ns()
+        board_array, used, fresh = analyzer.analyze_calibrated(img, corners,
+                                                               depth=session.depth(index) if use_depth else None)
+        if fresh:
+            corners = used
+        analysed = time.perf_counter_ns()
+        results = analyzer.analyze_binary_board_state(board_array)
+        end = time.perf_counter_ns()
+
+        latency["analyze_calibrated"].append((analysed - start) / 1e6)
+        latency["analyze_binary_board_state"].append((end - analysed) / 1e6)
+        latency["total"].append((end - start) / 1e6)
+        detected.append(results["detected_move"])
+
+    correct = None
+    if session.moves is not None:
+        correct = sum(1 for got, want in zip(detected, session.moves) if got == want)
+    return {
+        "latency_ms": latency,
+        "detected": detected,
+        "correct": correct,
+        "total": len(session.moves) if session.moves is not None else len(detected),
+    }
+
+
+def print_report(report):
+    print(f"{'stage':<28}{'n':>6}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}  (ms)")
+    for stage, samples in report["latency_ms"].items():
+        if not samples:
+            continue
+        samples = np.array(samples)
+        print(f"{stage:<28}{len(samples):>6}{samples.mean():>10.2f}{np.percentile(samples, 50):>10.2f}"
+              f"{np.percentile(samples, 95):>10.2f}{samples.max():>10.2f}")
+    if report["correct"] is not None:
+        print(f"move detection: {report['correct']}/{report['total']} correct")
+    print("detected:", " ".join(m or "-" for m in report["detected"]))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded Chess_Core session offline")
+    parser.add_argument("session", help="Session directory or .npz file")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the session this many times")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's debug log")
+    parser.add_argument("--ignore-depth", action="store_true", help="Replay colour only, even if depth was recorded")
+    args = parser.parse_args(args)
+
+    log_utils.configure("DEBUG" if args.verbose else "ERROR", period=0)
+    session = Session.load(args.session)
+    report = None
+    for _ in range(args.repeat):
+        run = replay_session(session, use_depth=not args.ignore_depth)
+        if report is None:
+            report = run
+        else:
+            for stage, samples in run["latency_ms"].items():
+                report["latency_ms"][stage].extend(samples)
+    print_report(report)
+    print("\nPipeline stages:")
+    print(timing.stages.format_summary())
+
+
+if __name__ == "__main__":
+    main()
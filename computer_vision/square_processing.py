@@ -279,6 +279,20 @@ def detect_chess_piece(image_path, DEBUG=False):
 import cv2
 import numpy as np
 
+# HSV ranges used to classify the coloured piece tops
+PINK_LOWER = np.array([150, 60, 80])
+PINK_UPPER = np.array([179, 255, 255])
+YELLOW_LOWER = np.array([0, 94, 136])
+YELLOW_UPPER = np.array([45, 255, 255])
+
+# HSV range of the blue board corner markers
+BLUE_LOWER = np.array([0, 199, 70])
+BLUE_UPPER = np.array([133, 255, 255])
+
+# Square classes, indexed the same way as a colour array value modulo 3
+# (0 = empty, 1 = white, -1 = black -> 2)
+SQUARE_CLASSES = ("empty", "white", "black")
+
 def detect_chess_piece_colour(image_input, DEBUG=False):
     """
     Detects if a red or yellow chess piece is present in the image based on HSV color.
@@ -306,14 +320,10 @@ def detect_chess_piece_colour(image_input, DEBUG=False):
     output = image.copy()
     hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
 
-    pink_lower = np.array([150, 60, 80])
-    pink_upper = np.array([179, 255, 255])
-    pink_mask = cv2.inRange(hsv, pink_lower, pink_upper)
+    pink_mask = cv2.inRange(hsv, PINK_LOWER, PINK_UPPER)
 
     # Yellow range
-    yellow_lower = np.array([0, 94, 136])
-    yellow_upper = np.array([45, 255, 255])
-    yellow_mask = cv2.inRange(hsv, yellow_lower, yellow_upper)
+    yellow_mask = cv2.inRange(hsv, YELLOW_LOWER, YELLOW_UPPER)
 
     # Decision logic
     piece_detected = False
@@ -341,6 +351,114 @@ def detect_chess_piece_colour(image_input, DEBUG=False):
     return piece_detected, piece_color, output
 
 
+def colour_fraction_probabilities(pink_fraction, yellow_fraction, tau=0.02, eps=1e-3):
+    """
+    Turns the fraction of pink and yellow pixels in a square into class probabilities.
+
+    A square is treated as empty with weight ``tau`` (the colour coverage at which
+    "empty" and "piece" are equally likely), so a square with no coloured pixels is
+    almost certainly empty while a square with a large blob is almost certainly a piece.
+
+    Args:
+        pink_fraction (float): Fraction of square pixels inside the pink range
+        yellow_fraction (float): Fraction of square pixels inside the yellow range
+        tau (float): Colour coverage treated as even odds between empty and occupied
+        eps (float): Probability floor so no class is ever impossible
+
+    Returns:
+        np.ndarray: [p_empty, p_white, p_black], summing to 1
+    """
+    weights = np.array([tau, pink_fraction, yellow_fraction], dtype=np.float64) + eps
+    return weights / weights.sum()
+
+
+def classify_colour_masks(pink_mask, yellow_mask, tau=0.02):
+    """
+    Classify a square from its already computed pink and yellow masks.
+
+    Uses the same decision as detect_chess_piece_colour (any pink pixel is a white
+    piece, otherwise any yellow pixel is a black piece) without converting to HSV.
+
+    Args:
+        pink_mask (np.ndarray): Binary mask of the square's pink pixels
+        yellow_mask (np.ndarray): Binary mask of the square's yellow pixels
+        tau (float): See colour_fraction_probabilities
+
+    Returns:
+        tuple: (piece_detected, color, probabilities)
+    """
+    area = float(pink_mask.size) or 1.0
+    pink_count = cv2.countNonZero(pink_mask)
+    yellow_count = cv2.countNonZero(yellow_mask)
+
+    if pink_count > 0:
+        piece_detected, piece_color = True, "white"
+    elif yellow_count > 0:
+        piece_detected, piece_color = True, "black"
+    else:
+        piece_detected, piece_color = False, None
+
+    probs = colour_fraction_probabilities(pink_count / area, yellow_count / area, tau=tau)
+    return piece_detected, piece_color, probs
+
+
+def classify_colour_counts(pink_counts, yellow_counts, areas, tau=0.02, eps=1e-3):
+    """
+    Classify many squares at once from their pink and yellow pixel counts.
+
+    Same decision and probabilities as classify_colour_masks, vectorised over squares.
+
+    Args:
+        pink_counts (np.ndarray): Pink pixels per square
+        yellow_counts (np.ndarray): Yellow pixels per square
+        areas (np.ndarray): Pixels sampled per square
+        tau (float): See colour_fraction_probabilities
+        eps (float): See colour_fraction_probabilities
+
+    Returns:
+        tuple: (values, probabilities), values 1 = white, -1 = black, 0 = empty per square
+               and probabilities an (n, 3) array of [p_empty, p_white, p_black]
+    """
+    areas = np.maximum(np.asarray(areas, dtype=np.float64), 1.0)
+    values = np.where(pink_counts > 0, 1, np.where(yellow_counts > 0, -1, 0)).astype(np.int8)
+
+    weights = np.empty((len(areas), 3), dtype=np.float64)
+    weights[:, 0] = tau
+    weights[:, 1] = pink_counts / areas
+    weights[:, 2] = yellow_counts / areas
+    weights += eps
+    return values, weights / weights.sum(axis=1, keepdims=True)
+
+
+def detect_chess_piece_probabilities(image_input, tau=0.02):
+    """
+    Soft version of detect_chess_piece_colour.
+
+    Args:
+        image_input (str or np.ndarray): Path to the image or already-loaded image array.
+        tau (float): See colour_fraction_probabilities
+
+    Returns:
+        np.ndarray: [p_empty, p_white, p_black] for the square
+    """
+    if isinstance(image_input, str):
+        image = cv2.imread(image_input)
+    elif isinstance(image_input, np.ndarray):
+        image = image_input
+    else:
+        raise ValueError("image_input must be a file path or a numpy.ndarray")
+
+    if image is None or image.size == 0:
+        raise ValueError("Failed to load image.")
+
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    area = float(hsv.shape[0] * hsv.shape[1])
+    pink_fraction = cv2.countNonZero(cv2.inRange(hsv, PINK_LOWER, PINK_UPPER)) / area
+    yellow_fraction = cv2.countNonZero(cv2.inRange(hsv, YELLOW_LOWER, YELLOW_UPPER)) / area
+
+    return colour_fraction_probabilities(pink_fraction, yellow_fraction, tau=tau)
+
+
 
 if __name__ == "__main__":
     img_path = "piecereal/colourpiece1.png"
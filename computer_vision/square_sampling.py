@@ -0,0 +1,198 @@
+import cv2
+import numpy as np
+from computer_vision import square_processing as sp
+
+
+def estimate_focal_length(homography, image_shape):
+    """
+    Focal length in pixels implied by a board -> camera homography
+
+    Uses the two constraints a plane's homography puts on the camera (Zhang's
+    calibration), assuming square pixels and the principal point at the image centre.
+
+    Returns:
+        float: Focal length, or None if the view is too close to top-down to tell
+    """
+    height, width = image_shape[:2]
+    centre = np.array([[1, 0, -(width - 1) / 2], [0, 1, -(height - 1) / 2], [0, 0, 1]], dtype=np.float64)
+    h = centre @ np.asarray(homography, dtype=np.float64)
+    h = h / np.linalg.norm(h)
+    # Columns 1 and 2 are f * r1, f * r2 in x and y and r1, r2 in z: orthogonal and of equal length
+    a = np.array([h[0, 0] * h[0, 1] + h[1, 0] * h[1, 1],
+                  h[0, 0] ** 2 + h[1, 0] ** 2 - h[0, 1] ** 2 - h[1, 1] ** 2])
+    b = np.array([h[2, 0] * h[2, 1], h[2, 0] ** 2 - h[2, 1] ** 2])
+    inverse_square = -float(a @ b) / float(a @ a) if float(a @ a) > 0 else 0.0
+    if not np.isfinite(inverse_square) or inverse_square <= 0:
+        return None
+    focal = 1.0 / np.sqrt(inverse_square)
+    # Outside this range the estimate is noise from a near top-down view
+    return focal if 0.3 * max(width, height) <= focal <= 5.0 * max(width, height) else None
+
+
+def board_pose(matrix, size, image_shape, focal_length=None):
+    """
+    Camera intrinsics and pose relative to the board from the board warp
+
+    The board is square but its warped image usually is not, so board coordinates
+    are warped image pixels with y rescaled to the x scale: (x, y * width / height).
+    z points into the board, so a point h pixels above the board is at z = -h on the
+    camera's side.
+
+    Args:
+        matrix (np.ndarray): 3x3 camera -> board image transform
+        size (tuple): (width, height) of the board image
+        image_shape (tuple): Shape of the camera frames
+        focal_length (float): Focal length in pixels, estimated from the warp if None
+            (falls back to the image width for a near top-down view)
+
+    Returns:
+        tuple: (K, R, t) with camera point = R @ board point + t
+    """
+    height, width = image_shape[:2]
+    homography = np.linalg.inv(np.asarray(matrix, dtype=np.float64)) @ np.diag([1.0, size[1] / size[0], 1.0])
+    if focal_length is None:
+        focal_length = estimate_focal_length(homography, image_shape) or float(max(width, height))
+
+    K = np.array([[focal_length, 0, (width - 1) / 2], [0, focal_length, (height - 1) / 2], [0, 0, 1]])
+    columns = np.linalg.inv(K) @ homography
+    scale = 2.0 / (np.linalg.norm(columns[:, 0]) + np.linalg.norm(columns[:, 1]))
+    # The board is in front of the camera
+    if columns[2, 2] < 0:
+        scale = -scale
+    r1, r2, t = columns[:, 0] * scale, columns[:, 1] * scale, columns[:, 2] * scale
+
+    # Nearest true rotation to the noisy estimate
+    u, _, vt = np.linalg.svd(np.column_stack([r1, r2, np.cross(r1, r2)]))
+    R = u @ vt
+    if np.linalg.det(R) < 0:
+        R = u @ np.diag([1, 1, -1]) @ vt
+    return K, R, t
+
+
+def lifted_warp(matrix, size, image_shape, height, focal_length=None):
+    """
+    Camera -> board transform for the plane `height` board pixels (x scale) above the board
+
+    Piece tops sit on this plane, so sampling through it follows each top to where
+    the camera actually sees it instead of the neighbouring square it leans into.
+    """
+    if not height:
+        return np.asarray(matrix, dtype=np.float64)
+    K, R, t = board_pose(matrix, size, image_shape, focal_length)
+    # Up is whichever side of the board the camera is on
+    up = -R[:, 2] if float(R[:, 2] @ t) > 0 else R[:, 2]
+    lifted = K @ np.column_stack([R[:, 0], R[:, 1], t + height * up]) @ np.diag([1.0, size[0] / size[1], 1.0])
+    return np.linalg.inv(lifted)
+
+
+class SquareSampler:
+    """
+    Camera-space sampling regions of the 64 padded board squares
+
+    Built once per board warp. The edges of all padded squares cut the board into a
+    grid of cells (an interior cell per square plus the strips where padded squares
+    overlap), and every camera pixel of the board window is labelled with the cell
+    its centre maps into. A frame is then classified with one np.bincount of
+    cell label * 4 + pink/yellow bits over that window, and the cell counts are summed
+    into the overlapping padded squares with a small matrix product, without
+    warpPerspective or per-square crops.
+    """
+
+    def __init__(self, corners, matrix, size, image_shape, bounds, height=0.0, focal_length=None):
+        """
+        Args:
+            corners (np.ndarray): Ordered board corners the warp was built from
+            matrix (np.ndarray): 3x3 camera -> board image transform
+            size (tuple): (width, height) of the board image
+            image_shape (tuple): Shape of the camera frames
+            bounds: Function (row, col, width, height) -> padded (x1, y1, x2, y2) of a
+                    square in the board image, e.g. game._square_bounds
+            height (float): Height of the piece tops in board image pixels; the regions
+                            are laid out on that plane to cancel parallax (see lifted_warp)
+            focal_length (float): Camera focal length in pixels, estimated if None
+        """
+        self.corners = np.array(corners, dtype=np.float32).reshape(4, 2)
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self.size = tuple(size)
+        self.image_shape = tuple(image_shape[:2])
+        self.height = float(height)
+        self.focal_length = focal_length
+        sample_matrix = lifted_warp(self.matrix, self.size, self.image_shape, self.height, focal_length)
+
+        width, height = self.size
+        image_height, image_width = self.image_shape
+        squares = [bounds(row, col, width, height) for row in range(8) for col in range(8)]
+
+        # Cell edges along each axis of the board image
+        edges_x = np.unique([v for x1, _, x2, _ in squares for v in (x1, x2)])
+        edges_y = np.unique([v for _, y1, _, y2 in squares for v in (y1, y2)])
+        cells_x, cells_y = len(edges_x) - 1, len(edges_y) - 1
+        self.cell_count = cells_x * cells_y
+
+        # Which cells make up each padded square
+        self.membership = np.zeros((64, self.cell_count), dtype=np.int64)
+        for index, (x1, y1, x2, y2) in enumerate(squares):
+            cx = np.arange(np.searchsorted(edges_x, x1), np.searchsorted(edges_x, x2))
+            cy = np.arange(np.searchsorted(edges_y, y1), np.searchsorted(edges_y, y2))
+            self.membership[index, (cy[:, None] * cells_x + cx[None, :]).ravel()] = 1
+
+        # Camera window holding the board, the only part of a frame that is segmented
+        board_rect = np.array([[-0.5, -0.5], [width - 0.5, -0.5], [width - 0.5, height - 0.5],
+                               [-0.5, height - 0.5]], dtype=np.float64)
+        quad = cv2.perspectiveTransform(board_rect.reshape(-1, 1, 2), np.linalg.inv(sample_matrix)).reshape(-1, 2)
+        wx1 = min(max(int(np.floor(quad[:, 0].min())), 0), image_width)
+        wy1 = min(max(int(np.floor(quad[:, 1].min())), 0), image_height)
+        wx2 = max(min(int(np.ceil(quad[:, 0].max())) + 1, image_width), wx1)
+        wy2 = max(min(int(np.ceil(quad[:, 1].max())) + 1, image_height), wy1)
+        self.window = (wx1, wy1, wx2, wy2)
+
+        # Board pixel each camera pixel centre lands on (the nearest-neighbour warp lookup)
+        grid_y, grid_x = np.mgrid[wy1:wy2, wx1:wx2]
+        points = np.stack([grid_x.ravel(), grid_y.ravel()], axis=1).astype(np.float64)
+        mapped = cv2.perspectiveTransform(points.reshape(-1, 1, 2), sample_matrix).reshape(-1, 2)
+        u = np.floor(mapped[:, 0] + 0.5)
+        v = np.floor(mapped[:, 1] + 0.5)
+        cell_x = np.searchsorted(edges_x, u, side="right") - 1
+        cell_y = np.searchsorted(edges_y, v, side="right") - 1
+        inside = (cell_x >= 0) & (cell_x < cells_x) & (cell_y >= 0) & (cell_y < cells_y)
+        # Pixels off the board go to one extra cell that belongs to no square
+        cells = np.where(inside, cell_y * cells_x + cell_x, self.cell_count)
+
+        # Premultiplied by the 4 possible pixel codes, so a frame only adds its codes
+        self.cell_keys = (cells * 4).astype(np.intp).reshape(wy2 - wy1, wx2 - wx1)
+        cell_areas = np.bincount(cells, minlength=self.cell_count + 1)[:self.cell_count]
+        self.areas = self.membership @ cell_areas
+
+    def matches(self, corners, shape, tolerance=1.0, height=0.0, focal_length=None):
+        """True if these regions still fit a warp built from corners on frames of this shape"""
+        corners = np.asarray(corners, dtype=np.float32).reshape(4, 2)
+        return tuple(shape[:2]) == self.image_shape and self.height == float(height) and \
+            self.focal_length == focal_length and \
+            float(np.abs(corners - self.corners).max()) <= tolerance
+
+    def counts(self, frame):
+        """
+        Pink and yellow pixel counts of every padded square
+
+        Args:
+            frame (FrameContext): The camera frame
+
+        Returns:
+            tuple: (pink, yellow) arrays of 64 counts, square index = row * 8 + col
+        """
+        codes = frame.piece_codes(*self.window)
+        counts = np.bincount((self.cell_keys + codes).ravel(), minlength=(self.cell_count + 1) * 4)
+        counts = counts.reshape(-1, 4)[:self.cell_count]
+        # Code 3 is a pixel inside both ranges, which counts for both colours like the masks do
+        return self.membership @ (counts[:, 1] + counts[:, 3]), self.membership @ (counts[:, 2] + counts[:, 3])
+
+    def classify(self, frame, tau=0.02):
+        """
+        Classify all 64 squares of a frame
+
+        Returns:
+            tuple: (8x8 board array, 8x8x3 [p_empty, p_white, p_black] probabilities)
+        """
+        pink, yellow = self.counts(frame)
+        values, probs = sp.classify_colour_counts(pink, yellow, self.areas, tau=tau)
+        return values.reshape(8, 8), probs.reshape(8, 8, 3)
@@ -0,0 +1,314 @@
+"""
+Render synthetic camera images of the board for benchmarks and accuracy checks.
+
+Boards are drawn top-down from a FEN with blue corner markers and pink (white) /
+yellow (black) piece tops in the default threshold colours, then optionally warped
+into a perspective view and degraded with lighting changes, blur, noise and
+occluding blobs. Every image comes with its ground-truth colour array and the
+camera-space board corners.
+
+Usage:
+    python -m computer_vision.synthetic_board --benchmark 200 --perspective 0.08 --noise 6
+    python -m computer_vision.synthetic_board --write out_dir --fen "8/8/8/8/8/8/8/4K2k w - - 0 1"
+"""
+import argparse
+import os
+import time
+import chess
+import cv2
+import numpy as np
+from computer_vision.python_chess3 import game
+
+# Default colours, chosen to sit inside the default HSV ranges
+PINK_BGR = (180, 105, 255)
+YELLOW_BGR = (0, 220, 255)
+BLUE_BGR = (255, 0, 0)
+LIGHT_SQUARE_BGR = (200, 200, 200)
+DARK_SQUARE_BGR = (60, 80, 60)
+TABLE_BGR = (90, 110, 90)
+# Washed-out piece top, outside every colour range
+GLARE_BGR = (235, 235, 240)
+# Real size of a square, sets the scale of rendered depth
+SQUARE_MM = 40.0
+
+
+def random_perspective(size, strength, rng):
+    """
+    Random board quad inside an image of the given size
+
+    Args:
+        size (tuple): (width, height) of the camera image
+        strength (float): Maximum corner displacement as a fraction of the image size
+        rng (np.random.Generator): Random source
+
+    Returns:
+        np.ndarray: 4x2 float32 corners [TL, TR, BR, BL]
+    """
+    width, height = size
+    margin = 0.12
+    base = np.array([[margin, margin], [1 - margin, margin],
+                     [1 - margin, 1 - margin], [margin, 1 - margin]])
+    jitter = rng.uniform(-strength, strength, size=(4, 2))
+    quad = np.clip(base + jitter, 0.02, 0.98) * [width, height]
+    return quad.astype(np.float32)
+
+
+def tilted_camera(side, image_size, tilt):
+    """
+    Pinhole camera looking at the centre of a top-down board image from `tilt` degrees off vertical
+
+    The camera sits beyond the bottom (white) edge, like the RealSense over the robot.
+
+    Returns:
+        tuple: (K, R, t) with camera point = R @ (x, y, z) + t, z pointing into the board
+    """
+    width, height = image_size
+    focal = float(width)
+    K = np.array([[focal, 0, (width - 1) / 2], [0, focal, (height - 1) / 2], [0, 0, 1]])
+    angle = np.radians(tilt)
+    centre = np.array([side / 2, side / 2, 0.0])
+    position = centre + 1.6 * side * np.array([0.0, np.sin(angle), -np.cos(angle)])
+
+    forward = (centre - position) / np.linalg.norm(centre - position)
+    right = np.array([1.0, 0.0, 0.0])
+    down = np.cross(forward, right)
+    R = np.stack([right, down, forward])
+    return K, R, -R @ position
+
+
+def render_board(fen=chess.STARTING_FEN, square=60, image_size=None, perspective=0.0, noise=0.0,
+                 blur=0, gain=1.0, gradient=0.0, occlusions=0, piece_radius=0.28, seed=None,
+                 tilt=0.0, piece_height=0.0, glare=0.0, with_depth=False):
+    """
+    Render one synthetic camera frame of a board position
+
+    Args:
+        fen (str): Position to draw (board part only is fine)
+        square (int): Square size in pixels of the top-down board
+        image_size (tuple): (width, height) of the output, defaults to the top-down size plus a margin
+        perspective (float): Random corner displacement as a fraction of the image, 0 = top-down
+        noise (float): Standard deviation of additive Gaussian noise
+        blur (int): Gaussian blur kernel size (0 = off, made odd if needed)
+        gain (float): Overall brightness multiplier
+        gradient (float): Brightness change from left to right edge (e.g. 0.4 = +-20%)
+        occlusions (int): Number of random grey blobs drawn over the image
+        piece_radius (float): Piece top radius as a fraction of a square
+        seed (int): Seed for reproducible perspective, jitter, noise and occlusions
+        tilt (float): View the board through a real camera tilted this many degrees off
+                      vertical instead of a random perspective quad
+        piece_height (float): Height of the piece tops in squares, drawn with parallax when tilted
+        glare (float): Fraction of piece tops drawn washed out, so colour cannot see them
+        with_depth (bool): Also render an aligned uint16 depth frame in mm (needs tilt)
+
+    Returns:
+        tuple: (BGR image, 8x8 ground-truth colour array, 4x2 board corners [TL, TR, BR, BL]),
+               plus the depth frame when with_depth is set
+    """
+    if with_depth and not tilt:
+        raise ValueError("Depth is only rendered for a tilted camera")
+    rng = np.random.default_rng(seed)
+    board = chess.Board(fen) if " " in fen else chess.Board(fen + " w - - 0 1")
+
+    # Top-down board with a border so markers are fully visible
+    margin = square
+    side = 8 * square + 2 * margin
+    top = np.full((side, side, 3), TABLE_BGR, dtype=np.uint8)
+    for row in range(8):
+        for col in range(8):
+            colour = LIGHT_SQUARE_BGR if (row + col) % 2 == 0 else DARK_SQUARE_BGR
+            x, y = margin + col * square, margin + row * square
+            cv2.rectangle(top, (x, y), (x + square - 1, y + square - 1), colour, -1)
+
+    truth = game.board_to_color_array(board)
+    pieces = []
+    for row, col in zip(*np.nonzero(truth)):
+        offset = rng.uniform(-0.08, 0.08, size=2) * square
+        centre = (int(margin + (col + 0.5) * square + offset[0]), int(margin + (row + 0.5) * square + offset[1]))
+        colour = PINK_BGR if truth[row, col] == 1 else YELLOW_BGR
+        pieces.append((centre, GLARE_BGR if rng.random() < glare else colour))
+    if not tilt:
+        for centre, colour in pieces:
+            cv2.circle(top, centre, int(piece_radius * square), colour, -1, lineType=cv2.LINE_AA)
+
+    board_corners = np.array([[margin, margin], [margin + 8 * square, margin],
+                              [margin + 8 * square, margin + 8 * square], [margin, margin + 8 * square]],
+                             dtype=np.float32)
+    for x, y in board_corners:
+        cv2.circle(top, (int(x), int(y)), max(4, square // 7), BLUE_BGR, -1, lineType=cv2.LINE_AA)
+
+    # Project into the camera image
+    if image_size is None:
+        image_size = (side, side)
+    if tilt:
+        K, R, t = tilted_camera(side, image_size, tilt)
+        matrix = K @ np.column_stack([R[:, 0], R[:, 1], t])
+        img = cv2.warpPerspective(top, matrix, image_size, borderValue=TABLE_BGR)
+        corners = cv2.perspectiveTransform(board_corners.reshape(-1, 1, 2), matrix).reshape(-1, 2)
+
+        if with_depth:
+            # Camera z of the table plane under every pixel
+            grid_y, grid_x = np.mgrid[0:image_size[1], 0:image_size[0]]
+            pixels = np.stack([grid_x.ravel(), grid_y.ravel()], axis=1).astype(np.float64)
+            plane = cv2.perspectiveTransform(pixels.reshape(-1, 1, 2), np.linalg.inv(matrix)).reshape(-1, 2)
+            plane_z = plane @ R[2, :2] + t[2]
+            depth = (plane_z * SQUARE_MM / square).reshape(image_size[1], image_size[0])
+
+        # Piece tops at their height, far rows first so nearer tops cover them
+        angles = np.linspace(0, 2 * np.pi, 48, endpoint=False)
+        for (cx, cy), colour in sorted(pieces, key=lambda piece: piece[0][1]):
+            ring = np.stack([cx + piece_radius * square * np.cos(angles), cy + piece_radius * square * np.sin(angles),
+                             np.full_like(angles, -piece_height * square)])
+            projected = K @ (R @ ring + t[:, None])
+            polygon = np.round((projected[:2] / projected[2]).T * 16).astype(np.int32)
+            cv2.fillPoly(img, [polygon], colour, lineType=cv2.LINE_AA, shift=4)
+            if with_depth:
+                cv2.fillPoly(depth, [polygon], float(projected[2].mean() * SQUARE_MM / square), shift=4)
+    elif perspective > 0 or image_size != (side, side):
+        target = random_perspective(image_size, perspective, rng)
+        # Map the board onto the target quad, the table fills in around it
+        matrix = cv2.getPerspectiveTransform(board_corners, target)
+        img = cv2.warpPerspective(top, matrix, image_size, borderValue=TABLE_BGR)
+        corners = target
+    else:
+        img = top
+        corners = board_corners
+
+    # Lighting: global gain and a horizontal gradient
+    if gain != 1.0 or gradient != 0.0:
+        ramp = gain * (1.0 + gradient * (np.linspace(-0.5, 0.5, img.shape[1])))
+        img = np.clip(img * ramp[None, :, None], 0, 255).astype(np.uint8)
+
+    for _ in range(occlusions):
+        centre = (int(rng.uniform(0, img.shape[1])), int(rng.uniform(0, img.shape[0])))
+        axes = (int(rng.uniform(0.3, 1.2) * square), int(rng.uniform(0.3, 1.2) * square))
+        shade = int(rng.uniform(40, 160))
+        cv2.ellipse(img, centre, axes, rng.uniform(0, 180), 0, 360, (shade, shade, shade), -1)
+
+    if blur:
+        k = int(blur) | 1
+        img = cv2.GaussianBlur(img, (k, k), 0)
+    if noise > 0:
+        img = np.clip(img + rng.normal(0, noise, img.shape), 0, 255).astype(np.uint8)
+
+    if with_depth:
+        # RealSense-like depth noise
+        depth = depth + rng.normal(0, 1.5, depth.shape)
+        return img, truth, corners, np.clip(depth, 0, 65535).astype(np.uint16)
+    return img, truth, corners
+
+
+def random_position(rng, plies=20):
+    """Board reached by playing random legal moves from the start"""
+    board = chess.Board()
+    for _ in range(plies):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        board.push(moves[rng.integers(len(moves))])
+    return board
+
+
+def benchmark(count, seed=0, sampling="warp", sample_height=0.0, use_depth=False, **render_options):
+    """
+    Time and score detect_blue_corners, analyze_chessboard and square classification
+
+    With use_depth the boards are rendered with depth (needs tilt) and analyze_chessboard
+    fuses it with colour.
+
+    Returns:
+        dict: Mean/p95 ms per stage, corner success rate, mean worst-corner error,
+              per-square accuracy and occupancy (empty vs piece) accuracy
+    """
+    rng = np.random.default_rng(seed)
+    analyzer = game()
+    analyzer.square_sampling = sampling
+    analyzer.piece_height = sample_height
+    frames = []
+    for i in range(count):
+        board = random_position(rng, plies=int(rng.integers(0, 60)))
+        frames.append(render_board(board.fen(), seed=seed + i, with_depth=use_depth, **render_options))
+
+    corner_ms, analyse_ms = [], []
+    corner_hits, corner_errors, correct_squares, correct_occupancy, total_squares = 0, [], 0, 0, 0
+    for img, truth, corners, *depth in frames:
+        start = time.perf_counter_ns()
+        found, success = analyzer.detect_blue_corners(img)
+        corner_ms.append((time.perf_counter_ns() - start) / 1e6)
+        corner_hits += int(success)
+        if success:
+            # Distance from each true corner to the nearest detected one
+            distances = np.linalg.norm(corners[:, None, :] - np.array(found, dtype=np.float32)[None], axis=-1)
+            corner_errors.append(float(distances.min(axis=1).max()))
+
+        start = time.perf_counter_ns()
+        board_array, _ = analyzer.analyze_chessboard(img, auto_calib=False, corners=corners,
+                                                     depth=depth[0] if depth else None)
+        analyse_ms.append((time.perf_counter_ns() - start) / 1e6)
+        correct_squares += int(np.sum(board_array == truth))
+        correct_occupancy += int(np.sum((board_array != 0) == (truth != 0)))
+        total_squares += 64
+
+    return {
+        "detect_blue_corners_ms": (float(np.mean(corner_ms)), float(np.percentile(corner_ms, 95))),
+        "analyze_chessboard_ms": (float(np.mean(analyse_ms)), float(np.percentile(analyse_ms, 95))),
+        "corner_success": corner_hits / count,
+        "corner_error_px": float(np.mean(corner_errors)) if corner_errors else float("nan"),
+        "square_accuracy": correct_squares / total_squares,
+        "occupancy_accuracy": correct_occupancy / total_squares,
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Synthetic chessboard images for benchmarks and tests")
+    parser.add_argument("--fen", default=chess.STARTING_FEN)
+    parser.add_argument("--write", help="Write image.png and truth.txt into this directory")
+    parser.add_argument("--benchmark", type=int, default=0, help="Benchmark over this many random boards")
+    parser.add_argument("--square", type=int, default=60)
+    parser.add_argument("--width", type=int, default=0, help="Camera image width (0 = top-down size)")
+    parser.add_argument("--height", type=int, default=0, help="Camera image height (0 = top-down size)")
+    parser.add_argument("--perspective", type=float, default=0.0)
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--blur", type=int, default=0)
+    parser.add_argument("--gain", type=float, default=1.0)
+    parser.add_argument("--gradient", type=float, default=0.0)
+    parser.add_argument("--occlusions", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tilt", type=float, default=0.0, help="Camera tilt in degrees (replaces --perspective)")
+    parser.add_argument("--piece-height", type=float, default=0.0, help="Rendered piece top height in squares")
+    parser.add_argument("--sampling", choices=("warp", "camera"), default="warp",
+                        help="Square sampling mode of analyze_chessboard for --benchmark")
+    parser.add_argument("--sample-height", type=float, default=0.0,
+                        help="game.piece_height used by camera sampling for --benchmark")
+    parser.add_argument("--glare", type=float, default=0.0, help="Fraction of piece tops washed out")
+    parser.add_argument("--depth", action="store_true",
+                        help="Render depth, fused in --benchmark and written as depth.png by --write (needs --tilt)")
+    args = parser.parse_args(args)
+
+    options = dict(square=args.square, perspective=args.perspective, noise=args.noise, blur=args.blur,
+                   gain=args.gain, gradient=args.gradient, occlusions=args.occlusions,
+                   tilt=args.tilt, piece_height=args.piece_height, glare=args.glare)
+    if args.width and args.height:
+        options["image_size"] = (args.width, args.height)
+
+    if args.benchmark:
+        result = benchmark(args.benchmark, seed=args.seed, sampling=args.sampling,
+                           sample_height=args.sample_height, use_depth=args.depth, **options)
+        for name, value in result.items():
+            if isinstance(value, tuple):
+                print(f"{name:<26} mean {value[0]:.2f}  p95 {value[1]:.2f}")
+            else:
+                print(f"{name:<26} {value:.3f}")
+
+    if args.write:
+        img, truth, corners, *depth = render_board(args.fen, seed=args.seed, with_depth=args.depth, **options)
+        os.makedirs(args.write, exist_ok=True)
+        cv2.imwrite(os.path.join(args.write, "image.png"), img)
+        if depth:
+            cv2.imwrite(os.path.join(args.write, "depth.png"), depth[0])
+        np.savetxt(os.path.join(args.write, "truth.txt"), truth, fmt="%d")
+        np.savetxt(os.path.join(args.write, "corners.txt"), corners, fmt="%.2f")
+        print(f"Wrote {args.write}")
+
+
+if __name__ == "__main__":
+    main()
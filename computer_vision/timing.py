@@ -0,0 +1,139 @@
+"""
+Low-overhead per-stage latency recording.
+
+Stages are timed with perf_counter_ns and stored in fixed-size ring buffers, so
+recording costs two clock reads and an array write and memory never grows over a
+game. The module-level `stages` recorder is shared by the vision pipeline and
+Chess_Core:
+
+    with timing.span("vision.warp"):
+        ...
+
+    laps = timing.laps()        # consecutive stages of one function
+    ...
+    laps.mark("vision.corners")  # time since the previous mark
+
+    timing.stages.summary()  # {stage: {"count", "p50_ms", "p95_ms", "max_ms"}}
+"""
+import time
+import numpy as np
+
+
+class StageTimer:
+    """Ring buffers of stage durations, keyed by stage name"""
+
+    def __init__(self, capacity=1024):
+        """
+        Args:
+            capacity (int): Samples kept per stage, older ones are overwritten
+        """
+        self.capacity = capacity
+        self.enabled = True
+        self.reset()
+
+    def reset(self):
+        """Drop all samples, e.g. at the start of a new game"""
+        self._buffers = {}
+        self._counts = {}
+        self.last = {}  # most recent duration per stage in ns
+
+    def record(self, stage, duration_ns):
+        buffer = self._buffers.get(stage)
+        if buffer is None:
+            buffer = self._buffers[stage] = np.zeros(self.capacity, dtype=np.int64)
+            self._counts[stage] = 0
+        count = self._counts[stage]
+        buffer[count % self.capacity] = duration_ns
+        self._counts[stage] = count + 1
+        self.last[stage] = duration_ns
+
+    def span(self, stage):
+        """Context manager timing one execution of a stage"""
+        return _Span(self, stage)
+
+    def laps(self):
+        """Lap timer for back-to-back stages, started now"""
+        return _Laps(self)
+
+    def samples(self, stage):
+        """Durations in ns still held for a stage (at most capacity, unordered)"""
+        count = self._counts.get(stage, 0)
+        return self._buffers[stage][:min(count, self.capacity)] if count else np.zeros(0, dtype=np.int64)
+
+    def summary(self):
+        """
+        Latency statistics per stage
+
+        Returns:
+            dict: {stage: {"count", "p50_ms", "p95_ms", "max_ms"}}, count is the total
+                  number of spans recorded, percentiles cover the retained samples
+        """
+        result = {}
+        for stage in self._buffers:
+            samples = self.samples(stage) / 1e6
+            result[stage] = {
+                "count": self._counts[stage],
+                "p50_ms": round(float(np.percentile(samples, 50)), 3),
+                "p95_ms": round(float(np.percentile(samples, 95)), 3),
+                "max_ms": round(float(samples.max()), 3),
+            }
+        return result
+
+    def format_summary(self):
+        """Summary as an aligned text table"""
+        lines = [f"{'stage':<28}{'count':>7}{'p50':>10}{'p95':>10}{'max':>10}  (ms)"]
+        for stage, stats in sorted(self.summary().items()):
+            lines.append(f"{stage:<28}{stats['count']:>7}{stats['p50_ms']:>10.2f}"
+                         f"{stats['p95_ms']:>10.2f}{stats['max_ms']:>10.2f}")
+        return "\n".join(lines)
+
+
+class _Span:
+    __slots__ = ("timer", "stage", "start")
+
+    def __init__(self, timer, stage):
+        self.timer = timer
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.timer.enabled:
+            self.timer.record(self.stage, time.perf_counter_ns() - self.start)
+        return False
+
+
+class _Laps:
+    __slots__ = ("timer", "start", "previous")
+
+    def __init__(self, timer):
+        self.timer = timer
+        self.start = self.previous = time.perf_counter_ns()
+
+    def mark(self, stage):
+        """Record the time since the previous mark (or the start) as one stage"""
+        now = time.perf_counter_ns()
+        if self.timer.enabled:
+            self.timer.record(stage, now - self.previous)
+        self.previous = now
+
+    def total(self, stage):
+        """Record the time since the start as one stage"""
+        if self.timer.enabled:
+            self.timer.record(stage, time.perf_counter_ns() - self.start)
+
+
+# Shared recorder for the whole node
+stages = StageTimer()
+
+
+def span(stage):
+    """Time a stage on the shared recorder"""
+    return stages.span(stage)
+
+
+def laps():
+    """Lap timer on the shared recorder"""
+    return stages.laps()
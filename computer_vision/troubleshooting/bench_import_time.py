@@ -0,0 +1,89 @@
+"""
+Measure the import cost of the Chess_Core entry point with python -X importtime.
+
+Each run imports the module in a fresh interpreter and reports the total import
+time, peak resident memory, the slowest top-level imports and whether any of the
+GUI/plotting packages (matplotlib, tkinter) were pulled in. Pass --with-gui to
+import them as well, which shows what loading them lazily saves.
+
+Usage:
+    python bench_import_time.py
+    python bench_import_time.py --module computer_vision.python_chess3 --repeat 5 --with-gui
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import numpy as np
+
+GUI_MODULES = ("matplotlib", "tkinter")
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+PROBE = """
+import resource, sys
+{preload}
+import {module}
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, ",".join(m for m in {gui!r} if m in sys.modules))
+"""
+
+
+def measure(module, preload=""):
+    """
+    Import a module in a fresh interpreter
+
+    Returns:
+        dict: "total_ms" cumulative import time, "rss_mb" peak resident memory,
+              "top" [(ms, name)] slowest top-level imports, "gui" GUI modules loaded
+    """
+    code = PROBE.format(module=module, preload=preload, gui=GUI_MODULES)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")])))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    top = []
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        # Top-level imports are indented by a single space
+        if match and len(match.group(3)) == 1:
+            top.append((int(match.group(2)) / 1e3, match.group(4)))
+    rss_kb, _, gui = proc.stdout.strip().splitlines()[-1].partition(" ")
+    return {
+        "total_ms": sum(ms for ms, _ in top),
+        "rss_mb": int(rss_kb) / 1024,
+        "top": sorted(top, reverse=True),
+        "gui": [m for m in gui.split(",") if m],
+    }
+
+
+def report(label, runs, show):
+    totals = np.array([run["total_ms"] for run in runs])
+    rss = np.array([run["rss_mb"] for run in runs])
+    print(f"{label}: import {np.median(totals):.1f} ms (min {totals.min():.1f}), "
+          f"peak RSS {np.median(rss):.1f} MB, GUI modules loaded: {', '.join(runs[-1]['gui']) or 'none'}")
+    for ms, name in runs[-1]["top"][:show]:
+        print(f"    {ms:>8.1f} ms  {name}")
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Import time and memory of the Chess_Core entry point")
+    parser.add_argument("--module", default="computer_vision.chess_core")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    parser.add_argument("--with-gui", action="store_true",
+                        help="Also measure with matplotlib.pyplot and tkinter imported up front")
+    args = parser.parse_args(args)
+
+    try:
+        report(args.module, [measure(args.module) for _ in range(args.repeat)], args.top)
+    except RuntimeError as e:
+        sys.exit(f"Could not import {args.module}: {e}")
+    if args.with_gui:
+        preload = "import matplotlib.pyplot\nimport tkinter"
+        report(f"{args.module} + GUI", [measure(args.module, preload) for _ in range(args.repeat)], args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark and regression-guard the colour-array move detection over full games.
+
+Every game is replayed ply by ply: the true position is converted to a colour array
+and fed to game.update_board (turn known), game.process_move (turn inferred) and
+game.infer_turn. Each path reports moves/sec over the calls themselves and how
+often it recovered the exact move, or at least a move giving the same colour array
+(promotion pieces cannot be told apart by colour alone). --missed drops readings at
+random so that some updates span several plies.
+
+Games come from a PGN file, from seeded random games weighted towards captures,
+castling, en passant and promotions, plus a few fixed games that are guaranteed to
+contain each special move.
+
+Usage:
+    python bench_move_detection.py --games 1000
+    python bench_move_detection.py --pgn lichess_sample.pgn --min-accuracy 0.99 --min-moves-per-sec 200
+"""
+import argparse
+import io
+import sys
+import time
+import chess
+import chess.pgn
+import numpy as np
+from computer_vision.python_chess3 import game
+from computer_vision import log_utils
+
+SPECIAL_GAMES = [
+    # En passant
+    "1. e4 a6 2. e5 d5 3. exd6 e6 4. d4 b5 5. d5 b4 6. c4 bxc3 *",
+    # Castling on both sides
+    "1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. O-O d6 5. d3 Bg4 6. Nc3 Qd7 7. Be3 O-O-O *",
+    # Promotion with capture, and under-promotion
+    "1. a4 b5 2. axb5 a6 3. bxa6 Bb7 4. axb7 Nc6 5. bxa8=Q Nf6 *",
+    "1. h4 g5 2. hxg5 h6 3. gxh6 Bg7 4. hxg7 Nf6 5. gxh8=N Nc6 *",
+    # Black promotes
+    "1. h4 g5 2. hxg5 h6 3. g6 h5 4. g7 h4 5. gxf8=Q+ Kxf8 6. Nf3 h3 7. e3 hxg2 8. Be2 gxh1=Q+ 9. Bf1 *",
+]
+
+
+def load_pgn_games(path, limit=None):
+    """Mainline moves of every game in a PGN file"""
+    games = []
+    with open(path) as f:
+        while limit is None or len(games) < limit:
+            parsed = chess.pgn.read_game(f)
+            if parsed is None:
+                break
+            games.append(list(parsed.mainline_moves()))
+    return games
+
+
+def special_games():
+    return [list(chess.pgn.read_game(io.StringIO(pgn)).mainline_moves()) for pgn in SPECIAL_GAMES]
+
+
+def random_game(rng, max_plies=160):
+    """Random legal game, favouring captures and special moves so they show up often"""
+    board = chess.Board()
+    moves = []
+    while len(moves) < max_plies and not board.is_game_over():
+        legal = list(board.legal_moves)
+        weights = np.array([
+            8.0 if board.is_castling(m) or board.is_en_passant(m) or m.promotion else
+            3.0 if board.is_capture(m) else 1.0
+            for m in legal
+        ])
+        move = legal[rng.choice(len(legal), p=weights / weights.sum())]
+        board.push(move)
+        moves.append(move)
+    return moves
+
+
+def replay(games, mode, missed=0.0, seed=0):
+    """
+    Replay games through one detection path
+
+    Args:
+        games (list): Games as lists of chess.Move
+        mode (str): "update_board", "process_move" or "infer_turn"
+        missed (float): Chance of skipping each reading, so the next one is several plies on
+        seed (int): Seed for the skipped readings
+
+    Returns:
+        dict: plies, seconds spent in the detection calls, exact and colour-equivalent hits
+    """
+    rng = np.random.default_rng(seed)
+    plies, elapsed_ns, exact, equivalent = 0, 0, 0, 0
+    for moves in games:
+        analyzer = game()
+        board = chess.Board()
+        for index, move in enumerate(moves):
+            before = analyzer.board_to_color_array(board)
+            turn = board.turn
+            board.push(move)
+            if mode != "infer_turn" and index + 1 < len(moves) and rng.random() < missed:
+                continue
+            after = analyzer.board_to_color_array(board)
+
+            start = time.perf_counter_ns()
+            if mode == "update_board":
+                analyzer.update_board(after)
+            elif mode == "process_move":
+                analyzer.process_move(after)
+            else:
+                inferred = analyzer.infer_turn(before, after)
+            elapsed_ns += time.perf_counter_ns() - start
+            plies += 1
+
+            if mode == "infer_turn":
+                # Keep the analyser in step with the true game between calls
+                exact += int(inferred == turn)
+                equivalent += int(inferred == turn)
+                analyzer.board.push(move)
+                analyzer.previous_board_array = after
+                continue
+
+            if analyzer.board.move_stack and analyzer.board.peek() == move:
+                exact += 1
+            if np.array_equal(analyzer.previous_board_array, after):
+                equivalent += 1
+            if analyzer.board.board_fen() != board.board_fen():
+                # Resynchronise so one miss does not fail the rest of the game
+                analyzer.board = board.copy()
+                analyzer.previous_board_array = after
+
+    return {"plies": plies, "seconds": elapsed_ns / 1e9, "exact": exact, "equivalent": equivalent}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark colour-array move detection over full games")
+    parser.add_argument("--pgn", help="PGN file to replay instead of random games")
+    parser.add_argument("--games", type=int, default=200, help="Number of games (random or read from --pgn)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", default="update_board,process_move,infer_turn")
+    parser.add_argument("--missed", type=float, default=0.0,
+                        help="Chance of dropping each reading to exercise missed-move recovery")
+    parser.add_argument("--min-accuracy", type=float, default=None,
+                        help="Fail if any mode's colour-equivalent accuracy is below this")
+    parser.add_argument("--min-moves-per-sec", type=float, default=None,
+                        help="Fail if any mode is slower than this")
+    parser.add_argument("--verbose", action="store_true", help="Show the detector's debug log")
+    args = parser.parse_args(args)
+
+    log_utils.configure("DEBUG" if args.verbose else "ERROR", period=0)
+    if args.pgn:
+        games = load_pgn_games(args.pgn, limit=args.games)
+    else:
+        rng = np.random.default_rng(args.seed)
+        games = [random_game(rng) for _ in range(args.games)]
+    games += special_games()
+
+    total_plies = sum(len(g) for g in games)
+    print(f"{len(games)} games, {total_plies} plies")
+    print(f"{'mode':<16}{'moves/s':>10}{'exact':>10}{'equiv':>10}")
+
+    failed = False
+    for mode in args.modes.split(","):
+        result = replay(games, mode, missed=args.missed, seed=args.seed)
+        rate = result["plies"] / result["seconds"] if result["seconds"] else float("inf")
+        exact = result["exact"] / result["plies"]
+        equivalent = result["equivalent"] / result["plies"]
+        print(f"{mode:<16}{rate:>10.1f}{exact:>10.4f}{equivalent:>10.4f}")
+
+        if args.min_accuracy is not None and equivalent < args.min_accuracy:
+            failed = True
+        if args.min_moves_per_sec is not None and rate < args.min_moves_per_sec:
+            failed = True
+
+    if failed:
+        print("Regression thresholds not met")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
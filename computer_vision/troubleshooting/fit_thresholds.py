@@ -0,0 +1,184 @@
+"""
+Fit the pink and yellow HSV ranges from board images with known positions.
+
+Each image is warped with the usual board calibration and every square is labelled
+from its FEN (pink = white piece, yellow = black piece). The squares' HSV pixels are
+binned into per-square 3D histograms once, after which any candidate range can be
+scored against all squares with a summed-volume lookup, so coordinate descent over
+the six bounds of both colours finishes in seconds.
+
+Usage:
+    python fit_thresholds.py start1.png start2.png --profile lab_evening
+    python fit_thresholds.py board.png --fen "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR"
+"""
+import argparse
+import os
+import cv2
+import chess
+import numpy as np
+from computer_vision import hsv_profile
+from computer_vision.evaluation import confusion_matrix, print_confusion
+from computer_vision.python_chess3 import game
+
+# Histogram bin sizes for H (0-179), S and V (0-255)
+BIN_SIZES = np.array([4, 8, 8])
+BIN_COUNTS = np.array([45, 32, 32])
+
+
+def square_histograms(image, corners, analyzer):
+    """
+    Per-square HSV histograms of the board, cropped exactly like analyze_chessboard
+
+    Returns:
+        np.ndarray: 64 x H x S x V pixel counts, squares in row-major board order
+    """
+    _, matrix, (width, height) = analyzer.board_warp(corners)
+    warped = cv2.warpPerspective(image, matrix, (width, height))
+    binned = cv2.cvtColor(warped, cv2.COLOR_BGR2HSV) // BIN_SIZES
+
+    hists = np.zeros((64, *BIN_COUNTS), dtype=np.int32)
+    for row in range(8):
+        for col in range(8):
+            x1, y1, x2, y2 = analyzer._square_bounds(row, col, width, height)
+            pixels = binned[y1:y2, x1:x2].reshape(-1, 3)
+            np.add.at(hists[row * 8 + col], (pixels[:, 0], pixels[:, 1], pixels[:, 2]), 1)
+    return hists
+
+
+def summed_volume(hists):
+    """Zero-padded 3D cumulative sums so box counts are eight lookups"""
+    table = np.zeros((hists.shape[0], *(BIN_COUNTS + 1)), dtype=np.int64)
+    table[:, 1:, 1:, 1:] = hists.cumsum(1).cumsum(2).cumsum(3)
+    return table
+
+
+def box_counts(table, box):
+    """
+    Pixels of every square inside an inclusive bin box
+
+    Args:
+        table: Output of summed_volume
+        box: (h0, s0, v0, h1, s1, v1) bin indices
+
+    Returns:
+        np.ndarray: One count per square
+    """
+    h0, s0, v0, h1, s1, v1 = box
+    h1, s1, v1 = h1 + 1, s1 + 1, v1 + 1
+    return (table[:, h1, s1, v1] - table[:, h0, s1, v1] - table[:, h1, s0, v1] - table[:, h1, s1, v0]
+            + table[:, h0, s0, v1] + table[:, h0, s1, v0] + table[:, h1, s0, v0] - table[:, h0, s0, v0])
+
+
+def classify(table, pink_box, yellow_box, min_pixels):
+    """Same decision as classify_colour_masks: pink wins, then yellow, else empty"""
+    pink = box_counts(table, pink_box) >= min_pixels
+    yellow = box_counts(table, yellow_box) >= min_pixels
+    return np.where(pink, 1, np.where(yellow, 2, 0))
+
+
+def range_to_box(lower, upper):
+    """HSV bounds to the bin box that contains them"""
+    return tuple(np.asarray(lower) // BIN_SIZES) + tuple(np.asarray(upper) // BIN_SIZES)
+
+
+def box_to_range(box):
+    """Bin box to HSV bounds (upper bound is the last value of the last bin)"""
+    lower = np.array(box[:3]) * BIN_SIZES
+    upper = np.minimum((np.array(box[3:]) + 1) * BIN_SIZES - 1, [179, 255, 255])
+    return lower, upper
+
+
+def fit_boxes(table, labels, pink_box, yellow_box, min_pixels, passes=4):
+    """
+    Coordinate descent over the twelve bounds of the pink and yellow boxes
+
+    Each bound in turn is moved to the middle of the run of values that give the best
+    per-square accuracy (keeping lower <= upper), which leaves the most margin for
+    lighting drift, until a full pass makes no change.
+    """
+    boxes = [list(pink_box), list(yellow_box)]
+
+    def accuracy():
+        return np.mean(classify(table, boxes[0], boxes[1], min_pixels) == labels)
+
+    for _ in range(passes):
+        changed = False
+        for box in boxes:
+            for i in range(6):
+                axis = i % 3
+                if i < 3:
+                    values = np.arange(0, box[i + 3] + 1)
+                else:
+                    values = np.arange(box[i - 3], BIN_COUNTS[axis])
+                current = box[i]
+                scores = []
+                for value in values:
+                    box[i] = value
+                    scores.append(accuracy())
+                scores = np.array(scores)
+                best_values = values[scores == scores.max()]
+                box[i] = int(best_values[len(best_values) // 2])
+                changed |= box[i] != current
+        if not changed:
+            break
+    return tuple(boxes[0]), tuple(boxes[1]), accuracy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit pink/yellow HSV ranges from labelled board images")
+    parser.add_argument("images", nargs="+", help="Board images")
+    parser.add_argument("--fen", action="append",
+                        help="Board FEN per image (repeat per image, default: starting position)")
+    parser.add_argument("--profile", default="default", help="Profile name or .json path to write")
+    parser.add_argument("--min-pixels", type=int, default=1,
+                        help="Pixels needed to call a square occupied (pipeline uses any pixel)")
+    parser.add_argument("--dry-run", action="store_true", help="Report only, do not write the profile")
+    args = parser.parse_args()
+
+    fens = args.fen or []
+    if fens and len(fens) != len(args.images):
+        parser.error("give one --fen per image or none at all")
+
+    analyzer = game()
+    hists, labels = [], []
+    for i, path in enumerate(args.images):
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError(f"Could not read image at {path}")
+        corners, success = analyzer.detect_blue_corners(image)
+        if not success:
+            raise ValueError(f"Blue corner markers not found in {path}")
+
+        board = chess.Board(fens[i]) if fens else chess.Board()
+        hists.append(square_histograms(image, corners, analyzer))
+        labels.append(analyzer.board_to_color_array(board).ravel() % 3)
+
+    table = summed_volume(np.concatenate(hists))
+    labels = np.concatenate(labels)
+
+    # Start from the saved profile if there is one, otherwise from the built-in ranges
+    path = hsv_profile.profile_path(args.profile)
+    ranges = hsv_profile.current_ranges()
+    if os.path.exists(path):
+        ranges.update(hsv_profile.load_profile(path))
+    pink_box = range_to_box(*ranges["pink"])
+    yellow_box = range_to_box(*ranges["yellow"])
+    print_confusion("Current thresholds", confusion_matrix(
+        labels, classify(table, pink_box, yellow_box, args.min_pixels)))
+
+    pink_box, yellow_box, _ = fit_boxes(table, labels, pink_box, yellow_box, args.min_pixels)
+    print_confusion("Fitted thresholds", confusion_matrix(
+        labels, classify(table, pink_box, yellow_box, args.min_pixels)))
+
+    ranges["pink"] = box_to_range(pink_box)
+    ranges["yellow"] = box_to_range(yellow_box)
+    for colour in ("pink", "yellow"):
+        print(f"{colour}: lower {ranges[colour][0]} upper {ranges[colour][1]}")
+
+    if not args.dry_run:
+        hsv_profile.save_profile(path, ranges)
+        print(f"Saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
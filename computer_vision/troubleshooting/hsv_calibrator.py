@@ -1,11 +1,29 @@
+import argparse
+import os
 import cv2
 import numpy as np
+from computer_vision import hsv_profile
 
 def nothing(x):
     pass
 
+parser = argparse.ArgumentParser(description="Tune an HSV range and save it to a threshold profile")
+parser.add_argument("image", nargs="?", default="realsenseboard6.png", help="Test image of the board")
+parser.add_argument("--colour", choices=sorted(hsv_profile.LIVE_RANGES), default="yellow")
+parser.add_argument("--profile", default="default",
+                    help="Profile name (saved under computer_vision/profiles) or path to a .json file")
+args = parser.parse_args()
+
+path = hsv_profile.profile_path(args.profile)
+
+# Start from the saved profile if there is one, otherwise from the built-in ranges
+ranges = hsv_profile.current_ranges()
+if os.path.exists(path):
+    ranges.update(hsv_profile.load_profile(path))
+lower, upper = ranges[args.colour]
+
 # Load test image
-image = cv2.imread("realsenseboard6.png")  # Replace with your actual test image
+image = cv2.imread(args.image)  # Replace with your actual test image
 if image is None:
     raise ValueError("Image not found. Make sure the path is correct.")
 
@@ -13,24 +31,25 @@ if image is None:
 hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
 
 # Create calibration window
-cv2.namedWindow("HSV Calibration - Yellow")
+window = f"HSV Calibration - {args.colour.capitalize()}"
+cv2.namedWindow(window)
 
-# Default yellow HSV range from you
-cv2.createTrackbar("H Lower", "HSV Calibration - Yellow", 5, 179, nothing)
-cv2.createTrackbar("H Upper", "HSV Calibration - Yellow", 45, 179, nothing)
-cv2.createTrackbar("S Lower", "HSV Calibration - Yellow", 43, 255, nothing)
-cv2.createTrackbar("S Upper", "HSV Calibration - Yellow", 255, 255, nothing)
-cv2.createTrackbar("V Lower", "HSV Calibration - Yellow", 127, 255, nothing)
-cv2.createTrackbar("V Upper", "HSV Calibration - Yellow", 255, 255, nothing)
+cv2.createTrackbar("H Lower", window, int(lower[0]), 179, nothing)
+cv2.createTrackbar("H Upper", window, int(upper[0]), 179, nothing)
+cv2.createTrackbar("S Lower", window, int(lower[1]), 255, nothing)
+cv2.createTrackbar("S Upper", window, int(upper[1]), 255, nothing)
+cv2.createTrackbar("V Lower", window, int(lower[2]), 255, nothing)
+cv2.createTrackbar("V Upper", window, int(upper[2]), 255, nothing)
 
+print("Press 's' to save to the profile, 'q' to save and quit, ESC to quit without saving")
 while True:
     # Read values from trackbars
-    h_lower = cv2.getTrackbarPos("H Lower", "HSV Calibration - Yellow")
-    h_upper = cv2.getTrackbarPos("H Upper", "HSV Calibration - Yellow")
-    s_lower = cv2.getTrackbarPos("S Lower", "HSV Calibration - Yellow")
-    s_upper = cv2.getTrackbarPos("S Upper", "HSV Calibration - Yellow")
-    v_lower = cv2.getTrackbarPos("V Lower", "HSV Calibration - Yellow")
-    v_upper = cv2.getTrackbarPos("V Upper", "HSV Calibration - Yellow")
+    h_lower = cv2.getTrackbarPos("H Lower", window)
+    h_upper = cv2.getTrackbarPos("H Upper", window)
+    s_lower = cv2.getTrackbarPos("S Lower", window)
+    s_upper = cv2.getTrackbarPos("S Upper", window)
+    v_lower = cv2.getTrackbarPos("V Lower", window)
+    v_upper = cv2.getTrackbarPos("V Upper", window)
 
     lower_bound = np.array([h_lower, s_lower, v_lower])
     upper_bound = np.array([h_upper, s_upper, v_upper])
@@ -45,10 +64,17 @@ while True:
     cv2.imshow("Mask Only", mask)
 
     key = cv2.waitKey(1) & 0xFF
-    if key == ord('q'):
-        print(f"\nFinal HSV Range for Yellow:")
+    if key in (ord('s'), ord('q')):
+        # A running Chess_Core watching this profile reloads it on the next poll
+        ranges[args.colour] = (lower_bound, upper_bound)
+        hsv_profile.save_profile(path, ranges)
+        print(f"\nFinal HSV Range for {args.colour.capitalize()}:")
         print(f"Lower: {lower_bound}")
         print(f"Upper: {upper_bound}")
+        print(f"Saved to {path}")
+        if key == ord('q'):
+            break
+    elif key == 27:
         break
 
 cv2.destroyAllWindows()
@@ -0,0 +1,188 @@
+"""
+Train the local piece classifier (computer_vision/piece_classifier.py) from labelled square crops.
+
+Crops are cut with board_crops exactly as analyze_chessboard does at run time and
+labelled from the known position of each frame:
+
+    --session DIR   a session recorded by Chess_Core (record_dir). Frames are labelled
+                    from moves.txt when it exists, otherwise from the positions the
+                    colour pipeline itself tracked, keeping only frames whose move it
+                    matched on all 64 squares
+    --image PATH    a board image, with --fen (default: starting position)
+    --synthetic N   N rendered boards with random lighting, perspective and noise
+
+Collected crops can be kept with --save-crops and reused with --crops. Every fifth
+board is held out, and the classifier is compared with the colour thresholds on it.
+
+Usage:
+    python train_piece_classifier.py --session recordings/game1 --session recordings/game2
+    python train_piece_classifier.py --image start.png --synthetic 200 --piece-types
+"""
+import argparse
+import chess
+import cv2
+import numpy as np
+from computer_vision import square_processing as sp
+from computer_vision import log_utils
+from computer_vision.evaluation import confusion_matrix, print_confusion
+from computer_vision.python_chess3 import game
+from computer_vision.piece_classifier import (CLASS_NAMES, DEFAULT_MODEL, PieceClassifier, board_crops,
+                                              piece_colour)
+from computer_vision.session_replay import Session
+
+PIECE_CLASSES = ["empty"] + [f"{side}_{chess.piece_name(piece)}" for side in ("white", "black")
+                             for piece in chess.PIECE_TYPES]
+
+
+def square_labels(board, classes):
+    """Class index of every square of a position, row-major from a8"""
+    labels = np.zeros(64, dtype=np.int64)
+    for square, piece in board.piece_map().items():
+        side = "white" if piece.color == chess.WHITE else "black"
+        name = side if len(classes) == 3 else f"{side}_{chess.piece_name(piece.piece_type)}"
+        labels[(7 - chess.square_rank(square)) * 8 + chess.square_file(square)] = classes.index(name)
+    return labels
+
+
+def frame_crops(analyzer, image, corners):
+    _, matrix, size = analyzer.board_warp(corners)
+    return board_crops(image, matrix, size, analyzer._square_bounds)
+
+
+def session_samples(path, classes):
+    """Crops and labels of every usable /move_complete frame of a recorded session"""
+    session = Session.load(path)
+    analyzer = game()
+    board = chess.Board()
+    corners = None
+    for k, stamp in enumerate(session.move_stamps):
+        # Play the ground truth for every event, also those skipped below, so labels stay in step
+        if session.moves is not None:
+            if k >= len(session.moves):
+                break
+            board.push_san(session.moves[k])
+
+        index = session.frame_after(stamp)
+        if index is None:
+            continue
+        image = session.frame(index)
+        found, success = analyzer.detect_blue_corners(image)
+        if success:
+            corners = found
+        if corners is None:
+            continue
+
+        if session.moves is not None:
+            position = board
+        else:
+            board_array, _ = analyzer.analyze_chessboard(image, auto_calib=False, corners=corners)
+            moved = analyzer.update_board(board_array)
+            # Only trust positions the colour pipeline matched exactly
+            if moved is None or analyzer.match_score < 64:
+                continue
+            position = analyzer.board
+        yield frame_crops(analyzer, image, corners), square_labels(position, classes)
+
+
+def image_samples(path, fen, classes):
+    analyzer = game()
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"Could not read image at {path}")
+    corners, success = analyzer.detect_blue_corners(image)
+    if not success:
+        raise ValueError(f"Blue corner markers not found in {path}")
+    yield frame_crops(analyzer, image, corners), square_labels(chess.Board(fen) if fen else chess.Board(), classes)
+
+
+def synthetic_samples(count, classes, seed=0):
+    from computer_vision.synthetic_board import random_position, render_board
+    rng = np.random.default_rng(seed)
+    analyzer = game()
+    for i in range(count):
+        board = random_position(rng, plies=int(rng.integers(0, 60)))
+        image, _, corners = render_board(board.fen(), seed=seed + i, image_size=(1280, 720),
+                                         perspective=rng.uniform(0.0, 0.08), noise=rng.uniform(0, 12),
+                                         gain=rng.uniform(0.3, 1.4), gradient=rng.uniform(-0.8, 0.8),
+                                         blur=int(rng.choice([0, 3, 5])))
+        yield frame_crops(analyzer, image, corners), square_labels(board, classes)
+
+
+def threshold_predictions(crops):
+    """[empty, white, black] index per crop from the colour thresholds, for comparison"""
+    predicted = np.zeros(len(crops), dtype=np.int64)
+    for i, crop in enumerate(crops):
+        is_piece, colour, _ = sp.detect_chess_piece_colour(crop)
+        if is_piece:
+            predicted[i] = 1 if colour == "white" else 2
+    return predicted
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Train the local piece classifier from labelled square crops")
+    parser.add_argument("--session", action="append", default=[], help="Recorded session directory or .npz")
+    parser.add_argument("--image", action="append", default=[], help="Board image")
+    parser.add_argument("--fen", action="append", help="Board FEN per --image (default: starting position)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Rendered boards to add")
+    parser.add_argument("--crops", action="append", default=[], help="Crops saved earlier with --save-crops")
+    parser.add_argument("--save-crops", help="Write the collected crops and labels to this .npz")
+    parser.add_argument("--piece-types", action="store_true",
+                        help="Classify piece types, not only colours (needs recorded sessions, "
+                             "rendered boards draw every piece alike)")
+    parser.add_argument("--epochs", type=int, default=400)
+    parser.add_argument("--output", default=DEFAULT_MODEL, help="Model file to write")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(args)
+
+    if args.fen and len(args.fen) != len(args.image):
+        parser.error("give one --fen per --image or none at all")
+    log_utils.configure("ERROR", period=0)
+    classes = PIECE_CLASSES if args.piece_types else CLASS_NAMES
+
+    crops, labels = [], []
+    sources = [session_samples(path, classes) for path in args.session]
+    sources += [image_samples(path, args.fen[i] if args.fen else None, classes) for i, path in enumerate(args.image)]
+    if args.synthetic:
+        sources.append(synthetic_samples(args.synthetic, classes, args.seed))
+    for source in sources:
+        for board_crops_, board_labels in source:
+            crops.append(board_crops_)
+            labels.append(board_labels)
+    for path in args.crops:
+        with np.load(path, allow_pickle=False) as data:
+            if list(data["classes"]) != classes:
+                raise ValueError(f"{path} was saved with classes {list(data['classes'])}")
+            crops.extend(data["crops"])
+            labels.extend(data["labels"])
+    if not crops:
+        parser.error("no training data, give --session, --image, --synthetic or --crops")
+
+    crops, labels = np.stack(crops), np.stack(labels)  # (boards, 64, ...) and (boards, 64)
+    if args.save_crops:
+        np.savez_compressed(args.save_crops, crops=crops, labels=labels, classes=np.array(classes))
+        print(f"Saved {len(crops)} boards of crops to {args.save_crops}")
+
+    held_out = np.arange(len(crops)) % 5 == 4
+    if not held_out.any():
+        held_out[-1] = len(crops) > 1
+    train = ~held_out
+    model = PieceClassifier.train(crops[train].reshape(-1, *crops.shape[2:]), labels[train].ravel(),
+                                  classes, epochs=args.epochs)
+    print(f"Trained on {train.sum() * 64} squares from {train.sum()} boards, {len(classes)} classes")
+
+    if held_out.any():
+        test_crops = crops[held_out].reshape(-1, *crops.shape[2:])
+        colour_index = np.array([0 if piece_colour(c) is None else (1 if piece_colour(c) == "white" else 2)
+                                 for c in classes])
+        test_labels = colour_index[labels[held_out].ravel()]
+        print_confusion("Colour thresholds (held out)",
+                        confusion_matrix(test_labels, threshold_predictions(test_crops)))
+        probs = model.colour_probabilities(model.predict(test_crops))
+        print_confusion("Piece classifier (held out)", confusion_matrix(test_labels, probs.argmax(axis=1)))
+
+    model.save(args.output)
+    print(f"Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
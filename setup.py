@@ -15,6 +15,7 @@ setup(
     entry_points={
         'console_scripts': [
             'chess_core = computer_vision.chess_core:main',
+            'replay_session = computer_vision.session_replay:main',
         ],
     },
 )